@@ -2,39 +2,121 @@ import os
 import json
 from pathlib import Path
 from flask import Flask, render_template, request, send_file, jsonify
-import pdfplumber
 import weasyprint
-from langdetect import detect
 import jinja2
-import tempfile
+import threading
 import time
+import copy
+from extraction_cache import ExtractionCache
+from jobs import JobQueue, QueueFullError
+from language_detect import DETECTOR_VERSION, detect_language
+from pdf_renderer import RendererBusyError, RendererPool, RenderTimeoutError
+from pdf_text import extract_pdf_text, page_count
+from preview import PreviewSessions
+from render_cache import RenderCache
+from resume_parser import PARSER_VERSION, parse_resume
+from upload_stream import MAX_UPLOAD_BYTES, SpoolingRequest
 
 app = Flask(__name__)
 
+# Uploads are hashed and kept in memory while the body is read (see upload_stream),
+# bodies larger than the limit are refused before they are read
+app.request_class = SpoolingRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 2**16  # room for the multipart headers
+MAX_PAGES = int(os.environ.get('CVMAKER_MAX_PAGES', 50))
+
+# Uploads are processed in the background so requests return immediately
+upload_jobs = JobQueue(workers=int(os.environ.get('CVMAKER_WORKERS', 2)))
+
+# Extraction results by SHA-256 of the uploaded bytes, repeated uploads skip pdfplumber;
+# entries from another parser or language detector version are ignored
+extraction_cache = ExtractionCache(cache_dir=os.environ.get('CVMAKER_CACHE_DIR') or None,
+                                   version=f'{PARSER_VERSION}.{DETECTOR_VERSION}')
+
 # Configure template directory
 template_dir = Path(__file__).parent / 'templates'
 app.jinja_loader = jinja2.FileSystemLoader(str(template_dir))
 
+# HTML sent to WeasyPrint; compiled once, content is the editor's HTML and is inserted as is
+RESUME_HTML_TEMPLATE = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <style>
+                :root {
+                    --primary-color: {{ colors.get('primary', '#2563eb') }};
+                    --secondary-color: {{ colors.get('secondary', '#475569') }};
+                    --background-color: {{ colors.get('background', '#ffffff') }};
+                    --text-color: {{ colors.get('text', '#000000') }};
+                }
+                
+                body {
+                    font-family: {{ '"Noto Sans SC"' if language == 'zh' else '"Inter"' }}, sans-serif;
+                    line-height: 1.6;
+                    margin: 0;
+                    padding: 20px;
+                    background-color: var(--background-color);
+                    color: var(--text-color);
+                }
+                
+                h1, h2, h3 {
+                    color: var(--primary-color);
+                    margin-top: {{ spacing.get('section', '2rem') }};
+                    margin-bottom: {{ spacing.get('item', '1rem') }};
+                }
+                
+                section {
+                    margin-bottom: {{ spacing.get('section', '2rem') }};
+                }
+                
+                pre {
+                    white-space: pre-wrap;
+                    font-family: inherit;
+                    margin: 0;
+                }
+            </style>
+        </head>
+        <body>
+            {{ content }}
+        </body>
+        </html>
+        """
+
 class CVMaker:
-    def __init__(self):
+    # Compiled once per process, shared by all instances
+    html_template = jinja2.Environment(autoescape=False, keep_trailing_newline=True).from_string(RESUME_HTML_TEMPLATE)
+
+    def __init__(self, renderer=None):
         self.supported_formats = ['.pdf', '.docx', '.txt']
         self.output_dir = Path(__file__).parent / 'output'
         self.output_dir.mkdir(exist_ok=True)
         self.template_dir = Path(__file__).parent / 'data'
         self.default_template = self.template_dir / 'template.fig'
+        self._styles_cache = {}  # template path -> (mtime_ns, styles)
+        self._styles_lock = threading.Lock()
+        self.renderer = renderer  # optional RendererPool of warm WeasyPrint workers
 
     def load_figma_template(self, template_path=None):
-        """Load and parse Figma template file."""
+        """Load and parse Figma template file; parsed styles are reused until the file's mtime changes."""
         if template_path is None:
             template_path = self.default_template
 
         try:
+            mtime_ns = os.stat(template_path).st_mtime_ns
+            with self._styles_lock:
+                cached = self._styles_cache.get(str(template_path))
+            if cached is not None and cached[0] == mtime_ns:
+                return copy.deepcopy(cached[1])
+
             with open(template_path, 'r', encoding='utf-8') as f:
                 template_data = json.load(f)
             
             # Extract styles and layout from Figma JSON
             styles = self.extract_figma_styles(template_data)
-            return styles
+            with self._styles_lock:
+                self._styles_cache[str(template_path)] = (mtime_ns, styles)
+            return copy.deepcopy(styles)
         except Exception as e:
             print(f"Error loading Figma template: {str(e)}")
             return None
@@ -70,95 +152,102 @@ class CVMaker:
         # TODO: Parse actual styles from Figma JSON
         return styles
 
-    def extract_text_from_pdf(self, pdf_path):
-        """Extract text content from PDF file."""
-        text_content = []
+    def extract_text_from_pdf(self, pdf_path, progress=None, max_chars=None, pages=None):
+        """Extract text content from PDF file (path or bytes), calling progress(pages_done, pages_total) per page.
+
+        Long documents are extracted in parallel page ranges, see pdf_text.iter_pdf_pages;
+        max_chars stops after the first pages holding that much text. pages: page count, if already known.
+        """
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for page in pdf.pages:
-                    text_content.append(page.extract_text())
-            return '\n'.join(text_content)
+            return extract_pdf_text(pdf_path, max_chars=max_chars, progress=progress, total=pages)
         except Exception as e:
             return f"Error extracting PDF content: {str(e)}"
 
     def detect_language(self, text):
         """Detect if the text is in English or Chinese."""
-        try:
-            lang = detect(text)
-            return 'zh' if lang == 'zh-cn' else 'en'
-        except:
-            return 'en'  # Default to English
+        return detect_language(text)
 
     def parse_resume_content(self, text):
-        """Parse raw text into structured JSON format."""
-        sections = {
-            'contact': {},
-            'summary': '',
-            'experience': [],
-            'education': [],
-            'skills': []
-        }
-        
-        # Basic parsing logic
-        lines = text.split('\n')
-        current_section = None
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Try to identify sections
-            lower_line = line.lower()
-            if any(keyword in lower_line for keyword in ['contact', 'email', 'phone', 'address']):
-                current_section = 'contact'
-                if '@' in line:
-                    sections['contact']['email'] = line
-                elif any(char.isdigit() for char in line):
-                    sections['contact']['phone'] = line
-            elif any(keyword in lower_line for keyword in ['summary', 'objective', 'profile']):
-                current_section = 'summary'
-                sections['summary'] = line
-            elif any(keyword in lower_line for keyword in ['experience', 'work', 'employment']):
-                current_section = 'experience'
-            elif any(keyword in lower_line for keyword in ['education', 'academic']):
-                current_section = 'education'
-            elif any(keyword in lower_line for keyword in ['skills', 'technologies', 'tools']):
-                current_section = 'skills'
-            elif current_section:
-                if current_section == 'experience':
-                    sections['experience'].append(line)
-                elif current_section == 'education':
-                    sections['education'].append(line)
-                elif current_section == 'skills':
-                    sections['skills'].append(line)
-                elif current_section == 'summary':
-                    sections['summary'] += ' ' + line
-        
-        return sections
+        """Parse raw text into structured JSON format (English and Chinese section headings, see resume_parser)."""
+        return parse_resume(text)
+
+    def render_html(self, content, template_styles=None, language='en'):
+        """Fill the precompiled resume HTML template with content and template styles."""
+        template_styles = template_styles or {}
+        return self.html_template.render(
+            content=content,
+            language=language,
+            colors=template_styles.get('colors', {}),
+            spacing=template_styles.get('spacing', {})
+        )
+
+    def render_pdf(self, html_content):
+        """Render HTML content to PDF bytes in memory, on the renderer pool if there is one."""
+        if self.renderer is not None:
+            return self.renderer.render(html_content)
+        return weasyprint.HTML(string=html_content).write_pdf()
 
     def generate_pdf(self, html_content, output_path=None):
         """Generate PDF from HTML content."""
         try:
             if output_path is None:
                 output_path = self.output_dir / f"resume_{int(time.time())}.pdf"
-            
-            # Create a temporary HTML file
-            with tempfile.NamedTemporaryFile(suffix='.html', mode='w', encoding='utf-8', delete=False) as f:
-                f.write(html_content)
-                temp_html = f.name
 
             # Generate PDF
-            weasyprint.HTML(filename=temp_html).write_pdf(output_path)
-            
-            # Clean up temporary file
-            os.unlink(temp_html)
+            with open(output_path, 'wb') as f:
+                f.write(self.render_pdf(html_content))
             
             return output_path
         except Exception as e:
             print(f"Error generating PDF: {str(e)}")
             return None
 
+# One instance per process: output dir created once, template styles parsed once,
+# PDFs rendered by warm worker processes (CVMAKER_RENDER_WORKERS, default one per core)
+cv_maker = CVMaker(renderer=RendererPool(timeout=int(os.environ.get('CVMAKER_RENDER_TIMEOUT', 30))))
+
+# Generated PDFs by hash of their HTML, kept in output/ and trimmed by size and age
+render_cache = RenderCache(
+    cv_maker.output_dir,
+    max_bytes=int(os.environ.get('CVMAKER_RENDER_CACHE_MB', 200)) * 2**20,
+    max_age=float(os.environ.get('CVMAKER_RENDER_CACHE_DAYS', 7)) * 24 * 3600
+)
+
+def remove_upload(source):
+    """Delete a spilled upload (a temp file path); in-memory bytes need no cleanup."""
+    if isinstance(source, str) and os.path.exists(source):
+        os.unlink(source)
+
+def process_upload(source, digest=None, pages=None, progress=None):
+    """Extract and parse an uploaded resume (bytes or spilled temp file path); runs in an upload job worker.
+
+    The result (without template styles) is stored in extraction_cache under digest;
+    pages is the page count /upload already read, so the PDF is not opened again just to count them.
+    """
+    progress = progress or (lambda stage, done=None, total=None: None)
+    try:
+        # Extract and process content
+        progress('extract')
+        content = cv_maker.extract_text_from_pdf(
+            source, pages=pages, progress=lambda done, total: progress('extract', done, total))
+        progress('detect_language')
+        language = cv_maker.detect_language(content)
+        progress('parse')
+        structured_data = cv_maker.parse_resume_content(content)
+
+        result = {
+            'content': content,
+            'language': language,
+            'structured_data': structured_data
+        }
+        if digest and not content.startswith('Error extracting PDF content'):
+            extraction_cache.put(digest, result)
+
+        # Load template styles
+        return dict(result, template_styles=cv_maker.load_figma_template())
+    finally:
+        remove_upload(source)
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -172,32 +261,69 @@ def upload_resume():
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
 
-    cv_maker = CVMaker()
-    
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(suffix=os.path.splitext(file.filename)[1], delete=False) as temp_file:
-        file.save(temp_file.name)
-        temp_path = temp_file.name
+    # The file was hashed while the body was read; same bytes uploaded before: answer from the cache
+    digest = file.stream.hexdigest()
+    cached = extraction_cache.get(digest)
+    if cached is not None:
+        return jsonify(dict(cached, template_styles=cv_maker.load_figma_template(), cached=True))
 
+    # Bytes in memory, or a temp file path for large uploads; the job removes it when done
+    source = file.stream.detach()
+
+    # Reject unreadable or too long documents before queueing any extraction work
     try:
-        # Extract and process content
-        content = cv_maker.extract_text_from_pdf(temp_path)
-        language = cv_maker.detect_language(content)
-        structured_data = cv_maker.parse_resume_content(content)
+        pages = page_count(source)
+    except Exception:
+        remove_upload(source)
+        return jsonify({'error': 'Could not read the file as PDF'}), 400
+    if pages > MAX_PAGES:
+        remove_upload(source)
+        return jsonify({'error': f'Documents are limited to {MAX_PAGES} pages'}), 413
 
-        # Load template styles
-        template_styles = cv_maker.load_figma_template()
+    try:
+        job_id = upload_jobs.submit(process_upload, source, digest, pages)
+    except QueueFullError:
+        remove_upload(source)
+        return jsonify({'error': 'Server busy, please retry shortly'}), 503
 
-        return jsonify({
-            'content': content,
-            'language': language,
-            'structured_data': structured_data,
-            'template_styles': template_styles
-        })
-    finally:
-        # Clean up temporary file
-        if os.path.exists(temp_path):
-            os.unlink(temp_path)
+    return jsonify({'job_id': job_id, 'status_url': f'/jobs/{job_id}'}), 202
+
+@app.errorhandler(413)
+def upload_too_large(error):
+    return jsonify({'error': f'File is larger than {MAX_UPLOAD_BYTES // 2**20}MB'}), 413
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status of an upload job; 'result' holds the extracted resume once status is 'done'."""
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify({
+        'job_id': job_id,
+        'status': job['status'],
+        'progress': job['progress'],
+        'result': job['result'],
+        'error': job['error']
+    })
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit / miss counters of the extraction and PDF render caches."""
+    return jsonify(dict(extraction_cache.stats(), render=render_cache.stats()))
+
+# Last parsed resume per editor session, for incremental previews
+preview_sessions = PreviewSessions()
+
+@app.route('/preview', methods=['POST'])
+def preview():
+    """Quick HTML preview of the edited text; only sections changed since the session's last call are returned."""
+    data = request.json or {}
+    session_id = data.get('session_id')
+    if not session_id:
+        return jsonify({'error': 'Missing session_id'}), 400
+
+    structured_data = cv_maker.parse_resume_content(data.get('text', ''))
+    return jsonify(preview_sessions.update(session_id, structured_data, data.get('language', 'en')))
 
 @app.route('/generate-pdf', methods=['POST'])
 def generate_pdf():
@@ -206,61 +332,24 @@ def generate_pdf():
         content = data.get('content', '')
         template_styles = data.get('template_styles', {})
         
-        cv_maker = CVMaker()
-        
         # Create HTML content with template styling
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <style>
-                :root {{
-                    --primary-color: {template_styles.get('colors', {}).get('primary', '#2563eb')};
-                    --secondary-color: {template_styles.get('colors', {}).get('secondary', '#475569')};
-                    --background-color: {template_styles.get('colors', {}).get('background', '#ffffff')};
-                    --text-color: {template_styles.get('colors', {}).get('text', '#000000')};
-                }}
-                
-                body {{
-                    font-family: {'"Noto Sans SC"' if data.get('language') == 'zh' else '"Inter"'}, sans-serif;
-                    line-height: 1.6;
-                    margin: 0;
-                    padding: 20px;
-                    background-color: var(--background-color);
-                    color: var(--text-color);
-                }}
-                
-                h1, h2, h3 {{
-                    color: var(--primary-color);
-                    margin-top: {template_styles.get('spacing', {}).get('section', '2rem')};
-                    margin-bottom: {template_styles.get('spacing', {}).get('item', '1rem')};
-                }}
-                
-                section {{
-                    margin-bottom: {template_styles.get('spacing', {}).get('section', '2rem')};
-                }}
-                
-                pre {{
-                    white-space: pre-wrap;
-                    font-family: inherit;
-                    margin: 0;
-                }}
-            </style>
-        </head>
-        <body>
-            {content}
-        </body>
-        </html>
-        """
+        html_content = cv_maker.render_html(content, template_styles, data.get('language'))
         
-        # Generate PDF
-        output_path = cv_maker.generate_pdf(html_content)
-        if output_path:
-            return send_file(str(output_path), as_attachment=True, download_name='resume.pdf')
-        else:
-            return jsonify({'error': 'Failed to generate PDF'}), 500
-            
+        # Same HTML as a PDF the client already has, or one rendered before: no rendering
+        etag = render_cache.key(html_content)
+        if request.if_none_match.contains(etag):
+            return '', 304, {'ETag': f'"{etag}"'}
+        pdf_path = render_cache.get(etag)
+        if pdf_path is None:
+            # Generate PDF in memory on the renderer pool
+            pdf_path = render_cache.put(etag, cv_maker.render_pdf(html_content))
+        return send_file(pdf_path, mimetype='application/pdf', as_attachment=True, download_name='resume.pdf',
+                         etag=etag, max_age=0)
+
+    except RendererBusyError as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '2'}
+    except RenderTimeoutError as e:
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
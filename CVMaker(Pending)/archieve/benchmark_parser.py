@@ -0,0 +1,129 @@
+"""
+Throughput of parse_resume_content, run from this folder:
+
+    python benchmark_parser.py                 # synthetic corpus (English + Chinese resumes)
+    python benchmark_parser.py resumes/*.txt   # your own extracted resume texts
+
+Compares the original keyword-scan parser with resume_parser and checks both give the same
+result on every English resume (the original has no Chinese headings).
+"""
+import argparse
+import random
+import time
+
+from resume_parser import parse_resume
+
+FILLER = ('led team built designed improved delivered python sql cloud data platform customers '
+          'revenue latency pipeline migration mentoring roadmap').split()
+FILLER_ZH = '负责 设计 开发 优化 团队 系统 数据 平台 用户 性能 项目 上线'.split()
+
+
+def legacy_parse_resume_content(text):
+    """Reference: the original CVMaker.parse_resume_content."""
+    sections = {'contact': {}, 'summary': '', 'experience': [], 'education': [], 'skills': []}
+    current_section = None
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        lower_line = line.lower()
+        if any(keyword in lower_line for keyword in ['contact', 'email', 'phone', 'address']):
+            current_section = 'contact'
+            if '@' in line:
+                sections['contact']['email'] = line
+            elif any(char.isdigit() for char in line):
+                sections['contact']['phone'] = line
+        elif any(keyword in lower_line for keyword in ['summary', 'objective', 'profile']):
+            current_section = 'summary'
+            sections['summary'] = line
+        elif any(keyword in lower_line for keyword in ['experience', 'work', 'employment']):
+            current_section = 'experience'
+        elif any(keyword in lower_line for keyword in ['education', 'academic']):
+            current_section = 'education'
+        elif any(keyword in lower_line for keyword in ['skills', 'technologies', 'tools']):
+            current_section = 'skills'
+        elif current_section:
+            if current_section == 'experience':
+                sections['experience'].append(line)
+            elif current_section == 'education':
+                sections['education'].append(line)
+            elif current_section == 'skills':
+                sections['skills'].append(line)
+            elif current_section == 'summary':
+                sections['summary'] += ' ' + line
+    return sections
+
+
+def synthetic_resume(rng, language='en', lines=120, summary_lines=20):
+    """A resume-shaped text with headings, contact lines and filler, in English or Chinese."""
+    if language == 'zh':
+        words, sep = FILLER_ZH, ''
+        headings = ['个人简介', '工作经历', '教育背景', '专业技能']
+        out = ['张三', '邮箱: zhang@example.com', '电话: 138 0000 0000']
+    else:
+        words, sep = FILLER, ' '
+        headings = ['Summary', 'Work Experience', 'Education', 'Skills']
+        out = ['Jane Doe', 'Email: jane@example.com', 'Phone: +1 555 010 0000', 'Address: 1 Main St']
+    out.append(headings[0])
+    out += [sep.join(rng.choice(words) for _ in range(14)) for _ in range(summary_lines)]
+    per_section = max(1, (lines - summary_lines) // 3)
+    for heading in headings[1:]:
+        out.append(heading)
+        out += [sep.join(rng.choice(words) for _ in range(rng.randint(4, 16))) for _ in range(per_section)]
+    return '\n'.join(out)
+
+
+def synthetic_corpus(count=500, seed=0):
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        language = 'zh' if i % 4 == 3 else 'en'
+        summary_lines = 400 if i % 50 == 0 else 20  # a few very long summaries
+        corpus.append((language, synthetic_resume(rng, language, summary_lines=summary_lines)))
+    return corpus
+
+
+def throughput(func, texts, repeat=3):
+    """Best wall time over repeat passes of func over all texts."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="parse_resume_content throughput")
+    parser.add_argument('files', nargs='*', help="resume .txt files (default: synthetic corpus)")
+    parser.add_argument('--count', type=int, default=500, help="synthetic resumes")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.files:
+        corpus = []
+        for path in args.files:
+            with open(path, 'r', encoding='utf-8') as f:
+                corpus.append(('?', f.read()))
+    else:
+        corpus = synthetic_corpus(args.count)
+    texts = [text for _, text in corpus]
+    lines = sum(text.count('\n') + 1 for text in texts)
+    megabytes = sum(len(text.encode('utf-8')) for text in texts) / 2**20
+
+    mismatches = sum(legacy_parse_resume_content(text) != parse_resume(text)
+                     for language, text in corpus if language != 'zh')
+    legacy = throughput(legacy_parse_resume_content, texts, args.repeat)
+    compiled = throughput(parse_resume, texts, args.repeat)
+
+    print(f"{len(texts)} resumes, {lines} lines, {megabytes:.1f} MB")
+    print(f"{'parser':10s} {'seconds':>8s} {'lines/s':>10s} {'MB/s':>7s}")
+    for name, seconds in (('legacy', legacy), ('compiled', compiled)):
+        print(f"{name:10s} {seconds:8.3f} {lines / seconds:10.0f} {megabytes / seconds:7.1f}")
+    print(f"speedup {legacy / compiled:.2f}x, English results identical: {'yes' if not mismatches else f'NO ({mismatches})'}")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
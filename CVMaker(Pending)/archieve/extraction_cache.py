@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+class ExtractionCache:
+    """Results of upload processing keyed by the SHA-256 of the uploaded bytes.
+
+    Held in memory as an LRU bounded by the JSON size of the results, and optionally
+    mirrored to cache_dir (one <sha256>.json per upload) so it survives restarts.
+    Entries written with a different `version` are ignored; change it when parsing or language detection changes.
+    """
+
+    def __init__(self, max_bytes=64 * 2**20, cache_dir=None, version=1):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.version = version
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # sha256 -> (size, result)
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, key):
+        """Cached result for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        result = self._read_disk(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._store(key, result)
+        return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._store(key, result)
+        self._write_disk(key, result)
+
+    def _store(self, key, result):
+        """Insert into the memory LRU (called with the lock held)."""
+        size = len(json.dumps(result))
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.current_bytes -= old[0]
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (size, result)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            _, (old_size, _) = self._entries.popitem(last=False)
+            self.current_bytes -= old_size
+            self.evictions += 1
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data['result'] if data.get('version') == self.version else None
+
+    def _write_disk(self, key, result):
+        if not self.cache_dir:
+            return
+        tmp_path = f'{self._path(key)}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.version, 'result': result}, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Error writing extraction cache: {str(e)}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+            }
@@ -0,0 +1,79 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueueFullError(Exception):
+    """Raised when too many jobs are waiting; the caller should retry later."""
+
+
+class JobQueue:
+    """In-process background job queue with a bounded worker pool.
+
+    submit() returns a job id at once; get() returns the job's status, progress and result.
+    Jobs are kept in memory, so they are local to one server process and lost on restart.
+    Finished jobs are dropped after `ttl` seconds.
+    """
+
+    def __init__(self, workers=2, max_pending=32, ttl=3600):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cvmaker-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(*args, progress=callback, **kwargs) and return its job id."""
+        with self._lock:
+            self._expire()
+            pending = sum(job['status'] in ('queued', 'running') for job in self._jobs.values())
+            if pending >= self.max_pending:
+                raise QueueFullError(f"{pending} jobs pending")
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'job_id': job_id,
+                'status': 'queued',
+                'progress': {},
+                'result': None,
+                'error': None,
+                'created': time.time(),
+                'finished': None,
+            }
+        self._executor.submit(self._run, job_id, func, args, kwargs)
+        return job_id
+
+    def get(self, job_id):
+        """Snapshot of a job as a dict, or None if unknown or expired."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return dict(job, progress=dict(job['progress']))
+
+    def _run(self, job_id, func, args, kwargs):
+        self._update(job_id, status='running', started=time.time())
+
+        def progress(stage, done=None, total=None):
+            with self._lock:
+                self._jobs[job_id]['progress'] = {'stage': stage, 'done': done, 'total': total}
+
+        try:
+            result = func(*args, progress=progress, **kwargs)
+        except Exception as e:
+            self._update(job_id, status='error', error=str(e), finished=time.time())
+        else:
+            self._update(job_id, status='done', result=result, finished=time.time())
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _expire(self):
+        """Drop finished jobs older than ttl (called with the lock held)."""
+        cutoff = time.time() - self.ttl
+        for job_id in [k for k, job in self._jobs.items() if job['finished'] and job['finished'] < cutoff]:
+            del self._jobs[job_id]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,75 @@
+import re
+import threading
+
+# Characters looked at per document, whatever its length
+SAMPLE_CHARS = 3000
+SAMPLE_WINDOWS = 3          # evenly spaced windows: start, middle, end
+ZH_RATIO = 0.3              # Han share of the letters at or above which the text is Chinese
+EN_RATIO = 0.02             # at or below which it is not Chinese
+MIN_LETTERS = 20            # fewer letters than this is too little to decide by ratio
+LANGDETECT_SEED = 0
+# Bump when the detected language can change for the same text (cached results are keyed on it)
+DETECTOR_VERSION = 2
+
+_LETTER = re.compile(r'[^\W\d_]')
+_HAN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')
+_KANA_HANGUL = re.compile(r'[\u3040-\u30ff\uac00-\ud7af]')  # Japanese / Korean also use Han characters
+
+_factory = None
+_factory_lock = threading.Lock()
+
+
+def sample_text(text, size=SAMPLE_CHARS, windows=SAMPLE_WINDOWS):
+    """Deterministic fixed-size sample: the whole text if short, else `windows` evenly spaced slices."""
+    if len(text) <= size:
+        return text
+    width = size // windows
+    step = (len(text) - width) // (windows - 1) if windows > 1 else 0
+    return '\n'.join(text[i * step:i * step + width] for i in range(windows))
+
+
+def cjk_guess(sample):
+    """'zh' or 'en' from the share of Han characters among the letters, or None when unclear."""
+    letters = len(_LETTER.findall(sample))
+    if letters < MIN_LETTERS:
+        return None
+    if _KANA_HANGUL.search(sample):
+        return None
+    ratio = len(_HAN.findall(sample)) / letters
+    if ratio >= ZH_RATIO:
+        return 'zh'
+    if ratio <= EN_RATIO:
+        return 'en'
+    return None
+
+
+def _get_factory():
+    """langdetect profiles, loaded once per process, with a fixed seed so results are reproducible."""
+    global _factory
+    with _factory_lock:
+        if _factory is None:
+            from langdetect.detector_factory import PROFILES_DIRECTORY, DetectorFactory
+
+            factory = DetectorFactory()
+            factory.load_profile(PROFILES_DIRECTORY)
+            factory.seed = LANGDETECT_SEED
+            _factory = factory
+        return _factory
+
+
+def detect_language(text):
+    """'zh' for Chinese, else 'en'; constant cost per document.
+
+    The CJK ratio of a fixed-size sample decides most documents; only mixed or very short
+    samples go to langdetect (seeded, so the same text always gives the same answer).
+    """
+    sample = sample_text(text)
+    guess = cjk_guess(sample)
+    if guess is not None:
+        return guess
+    try:
+        detector = _get_factory().create()
+        detector.append(sample)
+        return 'zh' if detector.detect().startswith('zh') else 'en'
+    except Exception:
+        return 'en'  # Default to English
@@ -0,0 +1,153 @@
+import multiprocessing
+import os
+import queue
+import threading
+
+# Rendered once by every worker at start, so fonts, default CSS and layout code are loaded before real requests
+WARMUP_HTML = '<html><body><h1>Warm up</h1><p>Inter 中文</p></body></html>'
+
+
+class RendererBusyError(Exception):
+    """All workers are busy and the wait queue is full."""
+
+
+class RenderTimeoutError(Exception):
+    """A render took longer than its timeout; the worker was restarted."""
+
+
+class RenderError(Exception):
+    """WeasyPrint failed on the document."""
+
+
+def _worker_main(conn):
+    """Worker process: one FontConfiguration for its whole life, renders HTML strings to PDF bytes."""
+    import weasyprint
+    from weasyprint.text.fonts import FontConfiguration
+
+    font_config = FontConfiguration()
+    weasyprint.HTML(string=WARMUP_HTML).write_pdf(font_config=font_config)
+    conn.send(('ready', None))
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        html, base_url = job
+        try:
+            pdf = weasyprint.HTML(string=html, base_url=base_url).write_pdf(font_config=font_config)
+            conn.send(('ok', pdf))
+        except Exception as e:
+            conn.send(('error', f'{type(e).__name__}: {e}'))
+
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.broken = False  # the process died (OOM kill, crash), replace it
+
+    def call(self, html, base_url, timeout):
+        if not self.ready:  # first use also waits for the warm-up render
+            self._receive(timeout)
+            self.ready = True
+        try:
+            self.conn.send((html, base_url))
+        except OSError:  # died while idle
+            self.broken = True
+            raise RenderError("Renderer process exited")
+        return self._receive(timeout)
+
+    def _receive(self, timeout):
+        try:
+            if not self.conn.poll(timeout):
+                raise RenderTimeoutError(f"Render took longer than {timeout}s")
+            status, payload = self.conn.recv()
+        except (EOFError, OSError):
+            self.broken = True
+            raise RenderError("Renderer process exited")
+        if status == 'error':
+            raise RenderError(payload)
+        return payload
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class RendererPool:
+    """Pool of warm WeasyPrint worker processes rendering HTML strings to PDF bytes in memory.
+
+    At most `workers` renders run at once and `max_queue` more may wait for a free worker;
+    beyond that render() raises RendererBusyError right away (back-pressure, answer 503).
+    A render exceeding `timeout` seconds raises RenderTimeoutError and its worker is replaced;
+    a worker found dead (before or during a render) is replaced as well.
+    Workers are started on first use.
+    """
+
+    def __init__(self, workers=None, max_queue=8, timeout=30):
+        self.workers = workers or int(os.environ.get('CVMAKER_RENDER_WORKERS', 0)) or os.cpu_count() or 1
+        self.timeout = timeout
+        self._context = multiprocessing.get_context('spawn')  # don't fork the threaded web server
+        self._slots = threading.BoundedSemaphore(self.workers + max_queue)
+        self._idle = queue.Queue()
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if not self._started:
+                for _ in range(self.workers):
+                    self._idle.put(_Worker(self._context))
+                self._started = True
+
+    def render(self, html, base_url=None, timeout=None):
+        """PDF bytes of an HTML string."""
+        timeout = timeout or self.timeout
+        if not self._slots.acquire(blocking=False):
+            raise RendererBusyError("Too many PDF renders waiting")
+        try:
+            self.start()
+            try:
+                worker = self._idle.get(timeout=timeout)
+            except queue.Empty:
+                raise RenderTimeoutError(f"No renderer free within {timeout}s")
+            if not worker.process.is_alive():  # died while idle, don't fail this render for it
+                worker.stop(kill=True)
+                worker = _Worker(self._context)
+            try:
+                pdf = worker.call(html, base_url, timeout)
+            except RenderTimeoutError:
+                worker.stop(kill=True)
+                worker = _Worker(self._context)
+                raise
+            except RenderError:
+                if worker.broken or not worker.process.is_alive():
+                    worker.stop(kill=True)
+                    worker = _Worker(self._context)
+                raise
+            finally:
+                self._idle.put(worker)
+            return pdf
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        with self._start_lock:
+            while True:
+                try:
+                    self._idle.get_nowait().stop()
+                except queue.Empty:
+                    break
+            self._started = False
@@ -0,0 +1,137 @@
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pdfplumber
+
+# Pages per worker task; documents up to this size are read in-process
+CHUNK_PAGES = 4
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def default_workers():
+    return int(os.environ.get('CVMAKER_PDF_WORKERS', 0)) or os.cpu_count() or 1
+
+
+def _get_pool():
+    """Process pool shared by all extractions, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the pool starts from a job thread of the threaded web server, forking that can deadlock
+            _pool = ProcessPoolExecutor(max_workers=default_workers(),
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _discard_pool(pool):
+    """Drop a broken pool, so the next _get_pool starts a fresh one (unless another caller already did)."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def open_pdf(source):
+    """Open a PDF given as a path or as bytes."""
+    if isinstance(source, (bytes, bytearray)):
+        return pdfplumber.open(io.BytesIO(source))
+    return pdfplumber.open(source)
+
+
+def page_count(source):
+    with open_pdf(source) as pdf:
+        return len(pdf.pages)
+
+
+def extract_page_range(source, start, stop):
+    """Text of pages [start, stop); runs in a worker process, which opens the file itself."""
+    texts = []
+    with open_pdf(source) as pdf:
+        for page in pdf.pages[start:stop]:
+            texts.append(page.extract_text() or '')
+            page.flush_cache()  # keep only one page's objects in memory
+    return texts
+
+
+def iter_pdf_pages(source, parallel=None, chunk_pages=CHUNK_PAGES, max_chars=None, total=None):
+    """Yield (page_number, text) of a PDF path or bytes in page order, as soon as a page and all before it are ready.
+
+    Longer documents are split into ranges of chunk_pages pages extracted by the shared worker processes
+    (CVMAKER_PDF_WORKERS, default one per core); parallel=False, or a single worker, reads in-process.
+    max_chars stops once that much text was yielded, remaining ranges are cancelled.
+    If a worker dies (the pool is broken), the remaining ranges are retried once on a fresh pool.
+    total is the page count if the caller already knows it (opening a PDF parses it again).
+    """
+    if parallel is None:
+        parallel = default_workers() > 1
+    if parallel and total is None:
+        total = page_count(source)
+    chars = 0
+
+    if not parallel or total <= chunk_pages:
+        with open_pdf(source) as pdf:
+            for number, page in enumerate(pdf.pages):
+                text = page.extract_text() or ''
+                page.flush_cache()
+                yield number, text
+                chars += len(text)
+                if max_chars is not None and chars >= max_chars:
+                    return
+        return
+
+    if not isinstance(source, (bytes, bytearray)):
+        source = os.path.abspath(source)
+    ranges = [(start, min(start + chunk_pages, total)) for start in range(0, total, chunk_pages)]
+    pool = None
+    futures = []
+    retried = False
+    try:
+        number = 0
+        done = 0  # ranges yielded
+        while done < len(ranges):
+            try:
+                if not futures:
+                    pool = _get_pool()
+                    futures = [pool.submit(extract_page_range, source, start, stop)
+                               for start, stop in ranges[done:]]
+                texts = futures[0].result()
+            except BrokenProcessPool:
+                # a worker died (e.g. killed for memory), every pending range of that pool fails with it
+                if retried:
+                    raise
+                retried = True
+                _discard_pool(pool)
+                futures = []
+                continue
+            futures.pop(0)
+            done += 1
+            for text in texts:
+                yield number, text
+                number += 1
+                chars += len(text)
+                if max_chars is not None and chars >= max_chars:
+                    return
+    finally:
+        # early stop or consumer gave up: drop ranges that did not start yet
+        for future in futures:
+            future.cancel()
+
+
+def extract_pdf_text(source, parallel=None, max_chars=None, progress=None, total=None):
+    """Joined text of all pages (or of the first pages holding max_chars characters)."""
+    if progress and total is None:
+        total = page_count(source)
+    texts = []
+    for number, text in iter_pdf_pages(source, parallel=parallel, max_chars=max_chars, total=total):
+        texts.append(text)
+        if progress:
+            progress(number + 1, total)
+    return '\n'.join(texts)
@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+
+import jinja2
+
+from resume_parser import SECTION_ORDER
+
+SECTION_TITLES = {
+    'en': {'contact': 'Contact', 'summary': 'Summary', 'experience': 'Experience',
+           'education': 'Education', 'skills': 'Skills'},
+    'zh': {'contact': '联系方式', 'summary': '个人简介', 'experience': '工作经历',
+           'education': '教育背景', 'skills': '专业技能'},
+}
+
+# One section of the quick HTML preview; text is escaped, unlike the PDF content
+SECTION_TEMPLATE = jinja2.Environment(autoescape=True).from_string("""\
+<section id="preview-{{ name }}" data-section="{{ name }}">
+    <h2>{{ title }}</h2>
+    {%- if value is mapping %}
+    <ul>{% for key, item in value.items() %}<li>{{ item }}</li>{% endfor %}</ul>
+    {%- elif value is string %}
+    <p>{{ value }}</p>
+    {%- else %}
+    <ul>{% for item in value %}<li>{{ item }}</li>{% endfor %}</ul>
+    {%- endif %}
+</section>""")
+
+
+def render_section(name, value, language='en'):
+    titles = SECTION_TITLES.get(language, SECTION_TITLES['en'])
+    return SECTION_TEMPLATE.render(name=name, title=titles.get(name, name.title()), value=value)
+
+
+class PreviewSessions:
+    """Last parsed resume of each editor session, so a preview only re-renders the sections that changed.
+
+    Sessions are identified by a client-generated id, kept in memory (least recently used first out)
+    and dropped after `ttl` seconds without updates.
+    """
+
+    def __init__(self, max_sessions=256, ttl=3600):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions = OrderedDict()  # session id -> {'structured', 'language', 'updated'}
+        self._lock = threading.Lock()
+
+    def update(self, session_id, structured, language='en'):
+        """Store the new structure and return the HTML of the sections that differ from the last one."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            last = self._sessions.pop(session_id, None)
+            self._sessions[session_id] = {'structured': structured, 'language': language, 'updated': now}
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+        if last is None or last['language'] != language:
+            changed = list(SECTION_ORDER)
+        else:
+            changed = [name for name in SECTION_ORDER
+                       if structured.get(name) != last['structured'].get(name)]
+        return {
+            'order': SECTION_ORDER,
+            'changed': changed,
+            'sections': {name: render_section(name, structured.get(name), language) for name in changed},
+        }
+
+    def _expire(self, now):
+        """Drop sessions idle for longer than ttl (called with the lock held)."""
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session['updated'] <= self.ttl:
+                break
+            del self._sessions[session_id]
+
+    def discard(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
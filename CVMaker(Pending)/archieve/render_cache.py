@@ -0,0 +1,86 @@
+import hashlib
+import os
+import threading
+import time
+
+
+class RenderCache:
+    """Generated PDFs stored in cache_dir as <sha256 of the final HTML>.pdf.
+
+    The key doubles as the ETag of /generate-pdf. After every store the directory is trimmed:
+    PDFs older than max_age seconds are removed, then the least recently used ones until the
+    total is below max_bytes. Any *.pdf in the directory counts, including old timestamped outputs.
+    """
+
+    def __init__(self, cache_dir, max_bytes=200 * 2**20, max_age=7 * 24 * 3600):
+        self.cache_dir = str(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(html_content):
+        return hashlib.sha256(html_content.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.pdf')
+
+    def get(self, key):
+        """Path of the cached PDF (marked as recently used), or None."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put(self, key, pdf):
+        """Store PDF bytes, trim the directory and return the cached path."""
+        path = self.path(key)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(pdf)
+        os.replace(tmp_path, path)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """Remove expired PDFs, then the least recently used until under max_bytes."""
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and entry.name.endswith('.pdf'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            cutoff = time.time() - self.max_age
+            for mtime, size, path in entries:
+                if mtime >= cutoff and total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:  # in use or already gone
+                    continue
+                total -= size
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
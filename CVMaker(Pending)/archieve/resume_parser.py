@@ -0,0 +1,111 @@
+from bisect import bisect_right
+from itertools import accumulate
+
+# Section keywords per language, in priority order: a line naming several sections goes to the first.
+# Add a language by adding a table here (or pass your own to SectionClassifier).
+SECTION_KEYWORDS = {
+    'en': {
+        'contact': ['contact', 'email', 'phone', 'address'],
+        'summary': ['summary', 'objective', 'profile'],
+        'experience': ['experience', 'work', 'employment'],
+        'education': ['education', 'academic'],
+        'skills': ['skills', 'technologies', 'tools'],
+    },
+    'zh': {
+        'contact': ['联系方式', '电话', '邮箱', '手机', '地址'],
+        'summary': ['个人简介', '简介', '自我评价', '个人总结', '求职意向', '概述'],
+        'experience': ['工作经历', '工作经验', '项目经历', '项目经验', '实习经历', '工作'],
+        'education': ['教育', '学历', '毕业院校'],
+        'skills': ['技能', '技术栈', '专长', '工具'],
+    },
+}
+SECTION_ORDER = ['contact', 'summary', 'experience', 'education', 'skills']
+# Bump when the parsed structure can change for the same text (cached results are keyed on it)
+PARSER_VERSION = 2
+
+
+class SectionClassifier:
+    """Finds the section headings of a resume by scanning the whole lowercased text, not line by line.
+
+    Same rule as the original chain of `any(keyword in lower_line ...)` checks: a keyword may appear
+    anywhere in a line (also inside words) and the highest priority section wins.
+    The keyword table is compiled into {keyword: section rank}; occurrences are found with str.find
+    over the whole document (C speed, overlapping matches included), then mapped to line numbers,
+    so lines without any keyword cost no Python work. A combined regex alternation was measured
+    2-3x slower than this on CPython.
+    """
+
+    def __init__(self, languages=None, keywords=SECTION_KEYWORDS):
+        languages = languages or list(keywords)
+        self.sections = [name for name in SECTION_ORDER if any(name in keywords[lang] for lang in languages)]
+        self._rank = {}  # keyword -> index of its highest priority section
+        for index, name in enumerate(self.sections):
+            for lang in languages:
+                for word in keywords[lang].get(name, []):
+                    self._rank.setdefault(word.lower(), index)
+
+    def _occurrences(self, lower_text):
+        """Yield (position, section index) of every keyword occurrence, overlapping ones included."""
+        find = lower_text.find
+        for word, rank in self._rank.items():
+            position = find(word)
+            while position != -1:
+                yield position, rank
+                position = find(word, position + 1)
+
+    def line_sections(self, text):
+        """{line number: section} for the lines of text (split on '\\n') that contain a keyword."""
+        lower_text = text.lower()
+        lower_lines = lower_text.split('\n')  # lower() never adds or removes newlines
+        line_starts = list(accumulate((len(line) + 1 for line in lower_lines[:-1]), initial=0))
+        best = {}
+        for position, rank in self._occurrences(lower_text):
+            number = bisect_right(line_starts, position) - 1
+            if rank < best.get(number, len(self.sections)):
+                best[number] = rank
+        return {number: self.sections[rank] for number, rank in best.items()}
+
+    def parse(self, text):
+        """Parse raw text into the structured resume dict of CVMaker.parse_resume_content."""
+        contact = {}
+        summary = []  # joined once at the end
+        lists = {'experience': [], 'education': [], 'skills': []}
+        current_section = None
+        headings = self.line_sections(text)
+
+        for number, line in enumerate(text.split('\n')):
+            line = line.strip()
+            if not line:
+                continue
+
+            section = headings.get(number)
+            if section == 'contact':
+                current_section = 'contact'
+                if '@' in line:
+                    contact['email'] = line
+                elif any(char.isdigit() for char in line):
+                    contact['phone'] = line
+            elif section == 'summary':
+                current_section = 'summary'
+                summary = [line]
+            elif section is not None:
+                current_section = section
+            elif current_section in lists:
+                lists[current_section].append(line)
+            elif current_section == 'summary':
+                summary.append(line)
+
+        return {
+            'contact': contact,
+            'summary': ' '.join(summary),
+            'experience': lists['experience'],
+            'education': lists['education'],
+            'skills': lists['skills'],
+        }
+
+
+default_classifier = SectionClassifier()
+
+
+def parse_resume(text, classifier=None):
+    return (classifier or default_classifier).parse(text)
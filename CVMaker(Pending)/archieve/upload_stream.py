@@ -0,0 +1,79 @@
+import hashlib
+import io
+import os
+import tempfile
+
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+# Uploads up to this size stay in memory, larger ones are spilled to a temp file
+SPILL_BYTES = 2 * 2**20
+MAX_UPLOAD_BYTES = 10 * 2**20
+
+
+class UploadSpool:
+    """Write target for one uploaded file while the request body is parsed.
+
+    Bytes are hashed as they arrive and kept in memory up to spill_bytes, then moved to a named
+    temp file (parallel PDF workers need a path). Writing more than max_bytes aborts with 413,
+    so oversized uploads are rejected before they are fully received.
+    """
+
+    def __init__(self, max_bytes=MAX_UPLOAD_BYTES, spill_bytes=SPILL_BYTES, suffix=''):
+        self.max_bytes = max_bytes
+        self.spill_bytes = spill_bytes
+        self.suffix = suffix
+        self.size = 0
+        self.path = None
+        self._digest = hashlib.sha256()
+        self._file = io.BytesIO()
+        self._detached = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self._discard()  # never reaches request.files, so close() would not be called
+            raise RequestEntityTooLarge(f"File is larger than {self.max_bytes // 2**20}MB")
+        self._digest.update(data)
+        if self.path is None and self.size > self.spill_bytes:
+            self._spill()
+        return self._file.write(data)
+
+    def _spill(self):
+        spilled = tempfile.NamedTemporaryFile(suffix=self.suffix, delete=False)
+        spilled.write(self._file.getvalue())
+        self._file = spilled
+        self.path = spilled.name
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+    def detach(self):
+        """Hand the content over as bytes or a temp file path; the caller removes the path when done."""
+        self._detached = True
+        if self.path is None:
+            return self._file.getvalue()
+        self._file.close()
+        return self.path
+
+    def close(self):
+        """Called by werkzeug at the end of the request; keeps a detached temp file."""
+        self._discard()
+
+    def _discard(self):
+        """Close the buffer and remove the temp file, unless it was handed over by detach()."""
+        self._file.close()
+        if self.path and not self._detached and os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def __getattr__(self, name):
+        # read / seek / tell / readline ... of the current buffer
+        return getattr(self._file, name)
+
+
+class SpoolingRequest(Request):
+    """Request whose uploaded files are written straight into an UploadSpool."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        suffix = os.path.splitext(filename or '')[1]
+        return UploadSpool(suffix=suffix)
@@ -1,68 +1,258 @@
-import cv2
 import numpy as np
 from PIL import Image, ImageColor
+import io
+import logging
 import os
 
-def modify_image_colors(
-    input_path,
-    output_path,
-    target_bg_color=(255, 255, 255),  # replace bg color (RGB)
-    new_bg_color=None,                # new bg color (RGB, RGBA, or HEX, None means transparent)
-    target_fg_color=None,             # replace fg color (RGB, None means not replace fg)
-    new_fg_color=None,                # new fg color (RGB, RGBA, or HEX, None means not replace)
-    change_all_fg=False,              # if True, change all non-background colors to new_fg_color
-    invert_mask=False,                # if True, invert the color matching mask
-    tolerance=40                      # color match tolerance
-):
-    
-    # ===[1. parse color]===
-    def parse_color(color):
-        """
-        Parse color to RGB array
-        """
-        if color is None:
-            return None
-        if isinstance(color, str):  # HEX
-            color = ImageColor.getrgb(color)
-        return np.array(color[:3])  # only RGB
-    
-    target_bg_color = parse_color(target_bg_color)
-    new_bg_color = parse_color(new_bg_color)
-    target_fg_color = parse_color(target_fg_color)
-    new_fg_color = parse_color(new_fg_color)
-
-    # ===[2. read image]===
-    if not os.path.exists(input_path):
-        raise FileNotFoundError(f"Input image not found: {input_path}")
-        
-    if input_path.lower().endswith('.png'):
-        # PNG may contain transparent channel, use PIL to read
-        try:
-            image = np.array(Image.open(input_path))
-            if len(image.shape) == 2:  # grayscale
-                image = np.dstack((image, image, image))
-            if image.shape[2] == 3:  # if no Alpha channel
-                image = np.dstack((image, np.full(image.shape[:2], 255)))
-        except Exception as e:
-            raise Exception(f"Failed to read PNG image: {e}")
+from color_match import DEFAULT_TILE_ROWS, border_connected, color_distance_sq, color_match_mask, estimate_background
+from recolor_trace import NULL_TRACE
+
+logger = logging.getLogger(__name__)
+
+def parse_color(color):
+    """
+    Parse color to RGB array
+    """
+    if color is None:
+        return None
+    if isinstance(color, str):  # HEX
+        color = ImageColor.getrgb(color)
+    return np.array(color[:3])  # only RGB
+
+
+# magic bytes -> Pillow format name, lets Image.open skip probing every plugin
+MAGIC_FORMATS = (
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+    (b'BM', 'BMP'),
+    (b'II*\x00', 'TIFF'),
+    (b'MM\x00*', 'TIFF'),
+    (b'\x00\x00\x01\x00', 'ICO'),
+)
+
+
+def detect_format(header):
+    """
+    Detect image format from the first bytes of the file, None if unknown
+    """
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'WEBP'
+    for magic, image_format in MAGIC_FORMATS:
+        if header.startswith(magic):
+            return image_format
+    return None
+
+
+def _rgba_buffer(height, width):
+    return np.empty((height, width, 4), dtype=np.uint8)
+
+
+def _pil_to_rgba(image, size=None):
+    """
+    Decode a PIL image straight into a contiguous uint8 RGBA array
+    """
+    if size is not None:
+        # for JPEG, thumbnail() first calls draft(), so libjpeg decodes at 1/2, 1/4 or 1/8 scale
+        image.thumbnail(size, Image.LANCZOS)
+    image.load()
+    return pil_image_to_rgba(image)
+
+
+def keeps_high_byte(image):
+    """
+    True if the 16/32-bit grayscale values of image are scaled to 8 bit by keeping the high byte
+    """
+    if image.mode.startswith('I;16'):
+        return True
+    return image.mode == 'I' and (image.getextrema()[1] or 0) > 255
+
+
+def pil_image_to_rgba(image, high_byte=None):
+    """
+    Convert a loaded PIL image (or a crop of one) of any mode to a contiguous uint8 RGBA array.
+    high_byte: see keeps_high_byte, pass the whole image's value when converting it piece by piece
+    """
+    if image.mode in ('I', 'I;16', 'I;16B', 'I;16L', 'F'):  # 16/32-bit grayscale, keep the high byte
+        values = np.asarray(image)
+        if high_byte is None:
+            high_byte = keeps_high_byte(image)
+        if high_byte:
+            values = values >> 8
+        output = _rgba_buffer(image.height, image.width)
+        output[:, :, :3] = np.clip(values, 0, 255)[:, :, None]
+        output[:, :, 3] = 255
+        return output
+
+    # map the numpy buffer as a Pillow image and paste into it: the mode conversion
+    # (RGB, L, LA, P + transparency, CMYK, ...) is written directly into the array
+    output = _rgba_buffer(image.height, image.width)
+    target = Image.frombuffer('RGBA', image.size, output, 'raw', 'RGBA', 0, 1)
+    target.readonly = 0  # write through to output instead of copying on write
+    target.paste(image if image.mode == 'RGBA' else image.convert('RGBA'))
+    return output
+
+
+def _cv2_to_rgba(data):
+    """
+    Fallback decoder for formats Pillow can't open, cv2 is only imported here
+    """
+    import cv2
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return None
+    if image.dtype != np.uint8:
+        image = (image >> 8).astype(np.uint8) if image.dtype == np.uint16 else np.clip(image, 0, 255).astype(np.uint8)
+    output = _rgba_buffer(*image.shape[:2])
+    if image.ndim == 2:
+        cv2.cvtColor(image, cv2.COLOR_GRAY2RGBA, dst=output)
+    elif image.shape[2] == 3:
+        cv2.cvtColor(image, cv2.COLOR_BGR2RGBA, dst=output)
     else:
-        # JPG use OpenCV to read, need to convert BGR->RGB
-        image = cv2.imread(input_path)
-        if image is None:
-            raise Exception(f"Failed to read image: {input_path}")
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        image = np.dstack((image, np.full(image.shape[:2], 255)))
-
-    # ===[3. create bg and fg mask]===
-    output_image = image.copy()
-        
+        cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA, dst=output)
+    return output
+
+
+def _array_to_rgba(source):
+    if source.dtype != np.uint8:
+        raise ValueError(f"Expected uint8 image array, got {source.dtype}")
+    if source.ndim == 3 and source.shape[2] == 4:
+        return source
+    if source.ndim not in (2, 3) or (source.ndim == 3 and source.shape[2] != 3):
+        raise ValueError(f"Expected (H, W), (H, W, 3) or (H, W, 4) array, got {source.shape}")
+    output = _rgba_buffer(*source.shape[:2])
+    output[:, :, :3] = source[:, :, None] if source.ndim == 2 else source
+    output[:, :, 3] = 255
+    return output
+
+
+def load_image(source, size=None):
+    """
+    Load image from a path, bytes, a file-like object or a numpy array as uint8 RGBA array.
+    The format is detected from magic bytes, not the file name.
+    size=(w, h) downscales to fit inside w x h (JPEG is decoded at reduced scale).
+    """
+    if isinstance(source, np.ndarray):
+        return _array_to_rgba(source)
+
+    if isinstance(source, (str, os.PathLike)):
+        input_path = os.fspath(source)
+        if not os.path.exists(input_path):
+            raise FileNotFoundError(f"Input image not found: {input_path}")
+        stream = open(input_path, 'rb')
+        name = input_path
+    else:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        stream = source
+        name = 'stream'
+        if not (hasattr(stream, 'seekable') and stream.seekable()):
+            # request bodies, HTTP responses: buffer them, the format sniff needs to seek back
+            stream = io.BytesIO(stream.read())
+
+    try:
+        start = stream.tell()
+        image_format = detect_format(stream.read(16))
+        stream.seek(start)
+        try:
+            image = Image.open(stream, formats=[image_format] if image_format else None)
+        except Exception:
+            image = None
+        if image is not None:
+            output = _pil_to_rgba(image, size)
+        else:
+            # not a Pillow format (e.g. EXR, JPEG 2000 without openjpeg), try OpenCV
+            stream.seek(start)
+            output = _cv2_to_rgba(stream.read())
+            if output is None:
+                raise Exception("unknown image format")
+            if size is not None:
+                image = Image.fromarray(output)
+                image.thumbnail(size, Image.LANCZOS)
+                output = np.array(image)
+    except Exception as e:
+        raise Exception(f"Failed to read image: {name}: {e}")
+    finally:
+        if stream is not source:
+            stream.close()
+    return output
+
+
+def read_image(input_path, size=None):
+    """
+    Read image file as uint8 RGBA array
+    """
+    return load_image(os.fspath(input_path), size)
+
+
+def encode_image(
+    image,                  # uint8 RGBA array
+    output_format='PNG',    # 'PNG' or 'WEBP' (any Pillow format works)
+    compress_level=6,       # PNG: zlib level 0-9, WEBP: lossless effort (method) 0-6
+    fp=None,                # optional file-like to write into, e.g. a response stream
+    **save_kwargs           # extra Pillow save options, e.g. quality=90, lossless=False for WEBP
+):
+    """
+    Encode RGBA array in memory; returns bytes, or fp when fp is given
+    """
+    output_format = output_format.upper()
+    if output_format == 'PNG':
+        save_kwargs.setdefault('compress_level', compress_level)
+    elif output_format == 'WEBP':
+        save_kwargs.setdefault('lossless', True)
+        save_kwargs.setdefault('method', min(compress_level, 6))
+    buffer = io.BytesIO() if fp is None else fp
+    Image.fromarray(image).save(buffer, format=output_format, **save_kwargs)
+    return buffer.getvalue() if fp is None else fp
+
+
+def apply_color_masks(
+    image,                  # source RGBA array (or a strip of rows of it)
+    output_image,           # destination RGBA array, may be image itself
+    target_bg_color,        # parsed colors, see parse_color
+    new_bg_color,
+    target_fg_color,
+    new_fg_color,
+    change_all_fg,
+    invert_mask,
+    tolerance,
+    edge_mode='hard',       # 'hard' boolean bg mask, 'soft' distance -> alpha ramp
+    soft_tolerance=None,    # (low, high) ramp for 'soft', None means (tolerance, 2 * tolerance)
+    decontaminate=False,    # 'soft' only: remove target_bg_color from semi-transparent edge pixels
+    mask_mode='global',     # 'global' every matching pixel, 'border' only bg connected to the image border
+    backend=None            # color matching backend, see color_match.get_backend
+):
+    """
+    Create bg and fg masks on image and write the new colors into output_image.
+    Purely per-pixel with mask_mode='global', so it can run on the whole image or on any strip of rows;
+    mask_mode='border' needs the whole image.
+    """
+    # process bg with anti-aliased edges
+    if target_bg_color is not None and edge_mode == 'soft':
+        if soft_tolerance is None:
+            soft_tolerance = (tolerance, 2 * tolerance)
+        region = None
+        if mask_mode == 'border':  # pixels that are not fully fg and reachable from the border
+            if invert_mask:  # coverage is 1 only at distance <= low
+                region = ~color_match_mask(image, target_bg_color, soft_tolerance[0], backend=backend)
+            else:  # coverage is 1 only at distance >= high
+                region = color_match_mask(image, target_bg_color, soft_tolerance[1], backend=backend)
+            region = border_connected(region)
+        apply_soft_bg(image, output_image, target_bg_color, new_bg_color, new_fg_color,
+                      change_all_fg, invert_mask, soft_tolerance, decontaminate, region=region)
+
     # process bg
-    if target_bg_color is not None:
-        bg_diff = np.sqrt(np.sum((image[:, :, :3].astype(float) - target_bg_color) ** 2, axis=2))
-        bg_mask = bg_diff < tolerance
+    elif target_bg_color is not None:
+        # int32 squared distance on the uint8 view, no float64 copy of the image
+        bg_mask = color_match_mask(image, target_bg_color, tolerance, backend=backend)
         
         if invert_mask:
             bg_mask = ~bg_mask  # invert the mask for cases like gradient background
+
+        if mask_mode == 'border':
+            bg_mask = border_connected(bg_mask)  # keep bg-colored pixels enclosed by the icon
             
         if new_bg_color is None:  # set transparent
             output_image[bg_mask, 3] = 0
@@ -76,19 +266,186 @@ def modify_image_colors(
     
     # process specific fg color if needed
     elif target_fg_color is not None and new_fg_color is not None:
-        fg_diff = np.sqrt(np.sum((image[:, :, :3].astype(float) - target_fg_color) ** 2, axis=2))
-        fg_mask = fg_diff < tolerance
+        fg_mask = color_match_mask(image, target_fg_color, tolerance, backend=backend)
         if invert_mask:
             fg_mask = ~fg_mask
         output_image[fg_mask, :3] = new_fg_color
+    return output_image
 
-    # ===[4. save image]===
-    output_image = output_image.astype(np.uint8)
-    Image.fromarray(output_image).save(output_path)
-    print(f"image saved to {output_path}")
+
+def apply_soft_bg(
+    image,
+    output_image,
+    target_bg_color,
+    new_bg_color,
+    new_fg_color,
+    change_all_fg,
+    invert_mask,
+    soft_tolerance,
+    decontaminate,
+    region=None,            # optional bool mask, pixels outside it are kept as fully fg
+    tile_rows=DEFAULT_TILE_ROWS
+):
+    """
+    Soft bg mask: fg coverage goes from 0 at distance <= low to 1 at distance >= high.
+    Transparent bg scales alpha by the coverage, a new bg color is blended in by it.
+    With decontaminate, edge pixels are treated as coverage * fg + (1 - coverage) * bg
+    and the bg part is removed, so no light/dark halo is left on the new background.
+    Everything is computed per row tile in one pass.
+    """
+    low, high = soft_tolerance
+    ramp = max(high - low, 1e-6)
+    bg = np.asarray(target_bg_color, dtype=np.float32)
+    for y0 in range(0, image.shape[0], tile_rows):
+        source = image[y0:y0 + tile_rows]
+        output = output_image[y0:y0 + tile_rows]
+
+        distance = np.sqrt(color_distance_sq(source, target_bg_color).astype(np.float32))
+        coverage = np.clip((distance - low) / ramp, 0, 1)
+        if invert_mask:
+            coverage = 1 - coverage
+        if region is not None:
+            coverage[~region[y0:y0 + tile_rows]] = 1
+        edge = (coverage > 0)[:, :, None]
+
+        rgb = source[:, :, :3].astype(np.float32)
+        if change_all_fg and new_fg_color is not None:
+            rgb[edge[:, :, 0]] = new_fg_color
+        elif decontaminate and not invert_mask:
+            alpha = np.maximum(coverage, 1e-6)[:, :, None]
+            rgb = np.where(edge, np.clip((rgb - (1 - alpha) * bg) / alpha, 0, 255), rgb)
+
+        if new_bg_color is None:  # scale alpha, keep rgb of fully transparent pixels
+            output[:, :, 3] = np.rint(source[:, :, 3] * coverage)
+            output[:, :, :3] = np.where(edge, np.rint(rgb), source[:, :, :3])
+        else:  # blend fg and new bg by coverage
+            blend = coverage[:, :, None] * rgb + (1 - coverage[:, :, None]) * np.asarray(new_bg_color, np.float32)
+            output[:, :, :3] = np.rint(blend)
+    return output_image
+
+
+def recolor_image(
+    source,                           # path, bytes, file-like object or numpy array
+    target_bg_color=(255, 255, 255),  # replace bg color (RGB, HEX, or 'auto' to detect it from the border)
+    new_bg_color=None,                # new bg color (RGB, RGBA, or HEX, None means transparent)
+    target_fg_color=None,             # replace fg color (RGB, None means not replace fg)
+    new_fg_color=None,                # new fg color (RGB, RGBA, or HEX, None means not replace)
+    change_all_fg=False,              # if True, change all non-background colors to new_fg_color
+    invert_mask=False,                # if True, invert the color matching mask
+    tolerance=40,                     # color match tolerance ('auto' to suggest it from the border pixels)
+    edge_mode='hard',                 # 'soft' for anti-aliased bg edges (alpha ramp)
+    soft_tolerance=None,              # (low, high) distance ramp for 'soft', None means (tolerance, 2 * tolerance)
+    decontaminate=False,              # 'soft' only: un-mix target_bg_color from edge pixels
+    mask_mode='global',               # 'border' only removes bg connected to the image border
+    backend=None,                     # mask backend: 'numpy', 'numexpr', 'numba', 'auto' (default: $ICONCOLOR_BACKEND)
+    cache=None,                       # optional DecodedImageCache, used for path sources
+    output_format=None,               # None returns the RGBA array, 'PNG'/'WEBP' returns encoded bytes
+    compress_level=6,                 # encoder compression level, see encode_image
+    trace=None                        # optional RecolorTrace, collects per-stage timings
+):
+    """
+    In-memory version of modify_image_colors, nothing is written to disk
+    """
+    trace = trace or NULL_TRACE
+    with trace.call():
+        # ===[1. parse color]===
+        with trace.stage('parse_color'):
+            auto_bg = isinstance(target_bg_color, str) and target_bg_color == 'auto'
+            auto_tolerance = isinstance(tolerance, str) and tolerance == 'auto'
+            target_bg_color = None if auto_bg else parse_color(target_bg_color)
+            new_bg_color = parse_color(new_bg_color)
+            target_fg_color = parse_color(target_fg_color)
+            new_fg_color = parse_color(new_fg_color)
+
+        # ===[2. read image]===
+        with trace.stage('read') as record:
+            if cache is not None and isinstance(source, (str, os.PathLike)):
+                image = cache.get(source)
+            else:
+                image = load_image(source)
+            record['shape'] = image.shape
+            record['nbytes'] = image.nbytes
+
+        # ===[2b. detect bg color / tolerance from the border pixels]===
+        if auto_bg or auto_tolerance:
+            with trace.stage('detect_bg'):
+                detected_color, detected_tolerance = estimate_background(
+                    image, target=None if auto_bg else target_bg_color)
+                if auto_bg:
+                    target_bg_color = detected_color
+                if auto_tolerance:
+                    tolerance = detected_tolerance if detected_tolerance is not None else 40
+                logger.debug("detected bg color %s, tolerance %s", target_bg_color, tolerance)
+
+        # ===[3. create bg and fg mask]===
+        with trace.stage('mask') as record:
+            output_image = image.copy()
+            apply_color_masks(image, output_image, target_bg_color, new_bg_color,
+                              target_fg_color, new_fg_color, change_all_fg, invert_mask, tolerance,
+                              edge_mode, soft_tolerance, decontaminate, mask_mode, backend)
+            record['shape'] = output_image.shape
+            record['nbytes'] = output_image.nbytes
+
+        # ===[4. encode image]===
+        if output_format is None:
+            return output_image
+        with trace.stage('encode') as record:
+            data = encode_image(output_image, output_format, compress_level)
+            record['bytes_written'] = len(data)
+        return data
+
+
+def modify_image_colors(
+    input_path,
+    output_path,
+    target_bg_color=(255, 255, 255),  # replace bg color (RGB, HEX, or 'auto' to detect it from the border)
+    new_bg_color=None,                # new bg color (RGB, RGBA, or HEX, None means transparent)
+    target_fg_color=None,             # replace fg color (RGB, None means not replace fg)
+    new_fg_color=None,                # new fg color (RGB, RGBA, or HEX, None means not replace)
+    change_all_fg=False,              # if True, change all non-background colors to new_fg_color
+    invert_mask=False,                # if True, invert the color matching mask
+    tolerance=40,                     # color match tolerance ('auto' to suggest it from the border pixels)
+    edge_mode='hard',                 # 'soft' for anti-aliased bg edges (alpha ramp)
+    soft_tolerance=None,              # (low, high) distance ramp for 'soft', None means (tolerance, 2 * tolerance)
+    decontaminate=False,              # 'soft' only: un-mix target_bg_color from edge pixels
+    mask_mode='global',               # 'border' only removes bg connected to the image border
+    backend=None,                     # mask backend: 'numpy', 'numexpr', 'numba', 'auto' (default: $ICONCOLOR_BACKEND)
+    cache=None,                       # optional DecodedImageCache, reuses decoded sources across calls
+    trace=None                        # optional RecolorTrace, collects per-stage timings (and profiles)
+):
+    trace = trace or NULL_TRACE
+    with trace.call():
+        output_image = recolor_image(
+            input_path,
+            target_bg_color=target_bg_color,
+            new_bg_color=new_bg_color,
+            target_fg_color=target_fg_color,
+            new_fg_color=new_fg_color,
+            change_all_fg=change_all_fg,
+            invert_mask=invert_mask,
+            tolerance=tolerance,
+            edge_mode=edge_mode,
+            soft_tolerance=soft_tolerance,
+            decontaminate=decontaminate,
+            mask_mode=mask_mode,
+            backend=backend,
+            cache=cache,
+            trace=trace
+        )
+
+        # ===[5. save image]===
+        with trace.stage('save') as record:
+            Image.fromarray(output_image).save(output_path)
+            bytes_written = os.path.getsize(output_path)
+            record['bytes_written'] = bytes_written
+    logger.info("image saved to %s", output_path,
+                extra={'input_path': str(input_path), 'output_path': str(output_path),
+                       'shape': output_image.shape, 'bytes_written': bytes_written})
 
 # example:
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     # 1. remove white background and make it transparent
     modify_image_colors(
         "/Users/xiao/Projects/git/ToolBox/IconColorModifier/images/267216.png",
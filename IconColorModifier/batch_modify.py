@@ -0,0 +1,301 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from IconColorModify import modify_image_colors
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp', '.gif', '.tif', '.tiff')
+MANIFEST_NAME = '.recolor_manifest.json'
+
+
+def collect_inputs(source, recursive=True):
+    """
+    Collect image files from a directory or a glob pattern.
+    Returns (base_dir, [paths]); base_dir is used to mirror sub folders into the output dir.
+    """
+    if os.path.isdir(source):
+        base_dir = os.path.abspath(source)
+        paths = []
+        for root, dirs, files in os.walk(base_dir):
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    paths.append(os.path.join(root, name))
+            if not recursive:
+                break
+    else:
+        paths = sorted(
+            os.path.abspath(p) for p in glob.glob(source, recursive=recursive)
+            if os.path.isfile(p) and p.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not paths:
+            return None, []
+        base_dir = os.path.commonpath([os.path.dirname(p) for p in paths])
+    return base_dir, paths
+
+
+def params_hash(spec):
+    """
+    Stable hash of the recolor spec, stored in the manifest to detect parameter changes
+    """
+    payload = json.dumps(spec, sort_keys=True, default=list)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def output_path_for(input_path, base_dir, output_dir, keep_extension=False):
+    """
+    Mirror input_path under output_dir, always writing PNG (keeps transparency).
+    keep_extension keeps the source extension in the name: a.jpg -> a.jpg.png
+    """
+    rel_path = os.path.relpath(input_path, base_dir)
+    if not keep_extension:
+        rel_path = os.path.splitext(rel_path)[0]
+    return os.path.join(output_dir, rel_path + '.png')
+
+
+def output_paths(paths, base_dir, output_dir):
+    """
+    {input path: output path} for a set of inputs, without two inputs sharing an output.
+    Inputs whose plain output name is shared (a.png, a.jpg -> a.png) keep their source extension
+    (a.jpg -> a.jpg.png), except a .png source which keeps a.png. Inputs that still collide
+    (a source actually named a.jpg.png) map to None.
+    """
+    groups = defaultdict(list)
+    for path in paths:
+        groups[output_path_for(path, base_dir, output_dir)].append(path)
+    outputs = {}
+    for output_path, group in groups.items():
+        if len(group) == 1:
+            outputs[group[0]] = output_path
+            continue
+        plain = next((p for p in group if os.path.splitext(p)[1] == '.png'), None)
+        for path in group:
+            outputs[path] = output_path if path == plain else output_path_for(path, base_dir, output_dir, True)
+    owners = defaultdict(list)
+    for path, output_path in outputs.items():
+        owners[output_path].append(path)
+    for group in owners.values():
+        for path in group[1:]:
+            outputs[path] = None
+    return outputs
+
+
+def is_up_to_date(entry, input_path, output_path, spec_hash, output_dir=None):
+    """
+    An output is up to date when it exists, is newer than its source,
+    and was produced from the same source mtime with the same parameters
+    (and, given output_dir, was written to output_path).
+    """
+    if not entry or entry.get('params') != spec_hash:
+        return False
+    if output_dir is not None and entry.get('output') != os.path.relpath(output_path, output_dir):
+        return False
+    try:
+        input_stat = os.stat(input_path)
+        output_stat = os.stat(output_path)
+    except OSError:
+        return False
+    return (entry.get('mtime_ns') == input_stat.st_mtime_ns
+            and output_stat.st_mtime_ns >= input_stat.st_mtime_ns)
+
+
+def _recolor_one(input_path, output_path, spec):
+    """
+    Worker entry point, runs in a child process
+    """
+    start = time.perf_counter()
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    modify_image_colors(input_path, output_path, **spec)
+    return time.perf_counter() - start
+
+
+def batch_modify_image_colors(
+    source,                # directory or glob pattern ('icons/**/*.png')
+    output_dir,            # outputs mirror the source tree under this dir
+    spec=None,             # shared keyword arguments for modify_image_colors
+    workers=None,          # process count, None means os.cpu_count()
+    recursive=True,        # walk sub folders / allow '**' in glob
+    force=False,           # if True, ignore the manifest and reprocess everything
+    progress=None          # callback(result, done, total) called for every file
+):
+    """
+    Recolor every image under source with the same spec, spread over a process pool.
+    Returns a list of per-file results: {'input', 'output', 'status', 'error', 'seconds'}
+    where status is 'ok', 'skipped' or 'error'.
+    """
+    spec = dict(spec or {})
+    spec_hash = params_hash(spec)
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    base_dir, paths = collect_inputs(source, recursive=recursive)
+    # outputs may live inside the source tree (images/ -> images/outputs/)
+    paths = [p for p in paths if os.path.commonpath([p, output_dir]) != output_dir]
+    manifest = {} if force else load_manifest(output_dir)
+    total = len(paths)
+    results = []
+
+    def report(result):
+        results.append(result)
+        if progress is not None:
+            progress(result, len(results), total)
+
+    # ===[1. skip outputs that are already up to date]===
+    outputs = output_paths(paths, base_dir, output_dir)
+    pending = []
+    for input_path in paths:
+        output_path = outputs[input_path]
+        key = os.path.relpath(input_path, base_dir)
+        if output_path is None:
+            report({'input': input_path, 'output': None, 'status': 'error',
+                    'error': "output name collides with another input", 'seconds': 0.0})
+        elif not force and is_up_to_date(manifest.get(key), input_path, output_path, spec_hash, output_dir):
+            report({'input': input_path, 'output': output_path,
+                    'status': 'skipped', 'error': None, 'seconds': 0.0})
+        else:
+            pending.append((key, input_path, output_path))
+
+    # ===[2. process the rest in parallel]===
+    if pending:
+        workers = workers or os.cpu_count() or 1
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+                futures = {}
+                for key, input_path, output_path in pending:
+                    mtime_ns = os.stat(input_path).st_mtime_ns
+                    future = executor.submit(_recolor_one, input_path, output_path, spec)
+                    futures[future] = (key, input_path, output_path, mtime_ns)
+
+                for future in as_completed(futures):
+                    key, input_path, output_path, mtime_ns = futures[future]
+                    result = {'input': input_path, 'output': output_path,
+                              'status': 'ok', 'error': None, 'seconds': 0.0}
+                    try:
+                        result['seconds'] = future.result()
+                        manifest[key] = {'mtime_ns': mtime_ns, 'params': spec_hash,
+                                         'output': os.path.relpath(output_path, output_dir)}
+                    except Exception as e:
+                        result['status'] = 'error'
+                        result['error'] = f"{type(e).__name__}: {e}"
+                        manifest.pop(key, None)
+                    report(result)
+        finally:
+            # ===[3. save manifest, also on interrupt so finished files are kept]===
+            save_manifest(output_dir, manifest)
+
+    return results
+
+
+def parse_color_arg(value):
+    """
+    Parse CLI color: 'none', 'auto', HEX ('#ffffff') or comma separated RGB/RGBA ('255,255,255')
+    """
+    if value is None or value.lower() == 'none':
+        return None
+    if value.lower() == 'auto':
+        return 'auto'
+    if ',' in value:
+        return tuple(int(v) for v in value.split(','))
+    return value if value.startswith('#') else '#' + value
+
+
+def parse_tolerance_arg(value):
+    return 'auto' if value.lower() == 'auto' else float(value)
+
+
+def add_spec_arguments(parser):
+    """
+    Recolor options shared by the command line tools
+    """
+    parser.add_argument('--bg', default='255,255,255', help="target bg color, 'none' to skip bg, 'auto' to detect")
+    parser.add_argument('--new-bg', default='none', help="new bg color, 'none' means transparent")
+    parser.add_argument('--fg', default='none', help="target fg color")
+    parser.add_argument('--new-fg', default='none', help="new fg color")
+    parser.add_argument('--change-all-fg', action='store_true')
+    parser.add_argument('--invert-mask', action='store_true')
+    parser.add_argument('--tolerance', type=parse_tolerance_arg, default=40.0, help="number or 'auto'")
+    parser.add_argument('--soft', action='store_true', help="anti-aliased bg edges (alpha ramp)")
+    parser.add_argument('--soft-range', default=None, help="LOW,HIGH distance ramp for --soft")
+    parser.add_argument('--decontaminate', action='store_true', help="with --soft, remove bg color from edges")
+    parser.add_argument('--mask-mode', choices=('global', 'border'), default='global',
+                        help="'border' only removes bg connected to the image border")
+
+
+def spec_from_args(args):
+    """
+    Build modify_image_colors keyword arguments from add_spec_arguments options
+    """
+    spec = {
+        'target_bg_color': parse_color_arg(args.bg),
+        'new_bg_color': parse_color_arg(args.new_bg),
+        'target_fg_color': parse_color_arg(args.fg),
+        'new_fg_color': parse_color_arg(args.new_fg),
+        'change_all_fg': args.change_all_fg,
+        'invert_mask': args.invert_mask,
+        'tolerance': args.tolerance,
+    }
+    if args.mask_mode != 'global':  # keep the spec hash of existing manifests unchanged
+        spec['mask_mode'] = args.mask_mode
+    if args.soft:
+        spec['edge_mode'] = 'soft'
+        spec['decontaminate'] = args.decontaminate
+        if args.soft_range:
+            spec['soft_tolerance'] = tuple(float(v) for v in args.soft_range.split(','))
+    return spec
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recolor a directory or glob of images in parallel.")
+    parser.add_argument('source', help="input directory or glob pattern (quote it)")
+    parser.add_argument('output_dir', help="output directory, mirrors the source tree")
+    add_spec_arguments(parser)
+    parser.add_argument('--workers', type=int, default=None, help="process count (default: all cores)")
+    parser.add_argument('--no-recursive', action='store_true')
+    parser.add_argument('--force', action='store_true', help="reprocess up-to-date outputs")
+    args = parser.parse_args(argv)
+    spec = spec_from_args(args)
+
+    def print_progress(result, done, total):
+        line = f"[{done}/{total}] {result['status']:7s} {result['input']}"
+        if result['error']:
+            line += f" ({result['error']})"
+        print(line, flush=True)
+
+    start = time.perf_counter()
+    results = batch_modify_image_colors(
+        args.source, args.output_dir, spec,
+        workers=args.workers,
+        recursive=not args.no_recursive,
+        force=args.force,
+        progress=print_progress
+    )
+    counts = {status: sum(r['status'] == status for r in results) for status in ('ok', 'skipped', 'error')}
+    print(f"done in {time.perf_counter() - start:.1f}s: "
+          f"{counts['ok']} ok, {counts['skipped']} skipped, {counts['error']} errors")
+    return 1 if counts['error'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
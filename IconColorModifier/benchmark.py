@@ -0,0 +1,333 @@
+"""
+Benchmarks for IconColorModifier, run from this folder:
+
+    python benchmark.py mask                        # float64 sqrt path vs int32 kernel on images/*
+    python benchmark.py mask --size 8192            # same, on synthetic upscaled copies
+    python benchmark.py pipeline -o bench.json      # 4 scenarios, images/* + 1k/4k/8k synthetic, JSON
+    python benchmark.py compare old.json new.json   # per-case speedup between two pipeline runs
+    python benchmark.py backends --size 8192        # numpy / numexpr / numba mask backends, timing + parity
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import PIL
+from PIL import Image
+
+from IconColorModify import recolor_image
+from color_match import available_backends, color_match_mask, get_backend
+from recolor_trace import RecolorTrace
+
+# the four documented scenarios of the IconColorModify.py __main__ block
+SCENARIOS = {
+    'transparent_bg': dict(target_bg_color=(255, 255, 255), new_bg_color=None, tolerance=40),
+    'bg_fg_replace': dict(target_bg_color=(255, 255, 255), new_bg_color=None,
+                          target_fg_color=(0, 0, 0), new_fg_color=(0, 255, 0), tolerance=100),
+    'change_all_fg': dict(target_bg_color=(255, 255, 255), new_bg_color=None,
+                          new_fg_color=(0, 255, 0), change_all_fg=True, tolerance=40),
+    'invert_mask': dict(target_bg_color=(0, 0, 0), new_bg_color=None, tolerance=60, invert_mask=True),
+}
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'images')
+SYNTHETIC_SIZES = (1024, 4096, 8192)
+SYNTHETIC_SOURCE = os.path.join(IMAGES_DIR, '267216.png')
+
+
+def sample_images():
+    """
+    Bundled sample images (outputs excluded)
+    """
+    paths = glob.glob(os.path.join(IMAGES_DIR, '*'))
+    return sorted(p for p in paths if os.path.isfile(p))
+
+
+def load_rgba(path, size=None):
+    """
+    Load as uint8 RGBA, optionally upscaled so the longest edge is size px
+    """
+    image = Image.open(path).convert('RGBA')
+    if size:
+        scale = size / max(image.size)
+        image = image.resize((round(image.width * scale), round(image.height * scale)), Image.NEAREST)
+    return np.array(image)
+
+
+def legacy_color_mask(image, target, tolerance):
+    """
+    Reference: the original float64 matching expression from modify_image_colors
+    """
+    diff = np.sqrt(np.sum((image[:, :, :3].astype(float) - np.array(target[:3])) ** 2, axis=2))
+    return diff < tolerance
+
+
+def measure(func, *args, repeat=3):
+    """
+    Best wall time over repeat runs and peak traced allocation of one run
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+        del result
+    tracemalloc.start()
+    result = func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def bench_mask(paths, size=None, target=(255, 255, 255), tolerance=40, repeat=3):
+    rows = []
+    for path in paths:
+        image = load_rgba(path, size)
+        legacy_mask, legacy_time, legacy_peak = measure(legacy_color_mask, image, target, tolerance, repeat=repeat)
+        kernel_mask, kernel_time, kernel_peak = measure(color_match_mask, image, target, tolerance, repeat=repeat)
+        rows.append({
+            'image': os.path.basename(path),
+            'shape': list(image.shape[:2]),
+            'legacy_seconds': legacy_time,
+            'kernel_seconds': kernel_time,
+            'legacy_peak_bytes': legacy_peak,
+            'kernel_peak_bytes': kernel_peak,
+            'identical': bool(np.array_equal(legacy_mask, kernel_mask)),
+        })
+    return rows
+
+
+def bench_backends(paths, size=None, target=(255, 255, 255), tolerances=(0, 1, 40, 40.5, 100, 500),
+                   backends=None, repeat=3):
+    """
+    Time every importable mask backend and check its masks equal the numpy baseline on all tolerances
+    """
+    backends = backends or available_backends()
+    rows = []
+    for path in paths:
+        image = load_rgba(path, size)
+        for name in backends:
+            resolved = get_backend(name)[0]
+            color_match_mask(image[:1], target, 40, backend=name)  # warm up (numba compiles on first call)
+            _, seconds, _ = measure(color_match_mask, image, target, 40, None, 256, name, repeat=repeat)
+            identical = all(
+                np.array_equal(color_match_mask(image, target, tolerance, backend='numpy'),
+                               color_match_mask(image, target, tolerance, backend=name))
+                for tolerance in tolerances)
+            rows.append({
+                'image': os.path.basename(path),
+                'shape': list(image.shape[:2]),
+                'backend': resolved,
+                'seconds': seconds,
+                'megapixels_per_second': image.shape[0] * image.shape[1] / seconds / 1e6,
+                'identical': bool(identical),
+            })
+    return rows
+
+
+def print_mask_table(rows):
+    print(f"{'image':18s} {'shape':>11s} {'legacy ms':>10s} {'kernel ms':>10s} "
+          f"{'legacy MB':>10s} {'kernel MB':>10s} {'speedup':>8s} {'mem x':>6s} same")
+    for row in rows:
+        shape = 'x'.join(str(v) for v in row['shape'])
+        print(f"{row['image'][:18]:18s} {shape:>11s} "
+              f"{row['legacy_seconds'] * 1e3:10.1f} {row['kernel_seconds'] * 1e3:10.1f} "
+              f"{row['legacy_peak_bytes'] / 2**20:10.1f} {row['kernel_peak_bytes'] / 2**20:10.1f} "
+              f"{row['legacy_seconds'] / row['kernel_seconds']:8.2f} "
+              f"{row['legacy_peak_bytes'] / max(row['kernel_peak_bytes'], 1):6.1f} "
+              f"{'yes' if row['identical'] else 'NO'}")
+
+
+def _peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # macOS reports bytes, Linux KB
+
+
+def run_case(path, scenario, repeat=3):
+    """
+    Time decode / mask / encode of one image and scenario (best of repeat).
+    Meant to run in a fresh process so peak RSS belongs to this case only.
+    """
+    stages = {'decode': float('inf'), 'mask': float('inf'), 'encode': float('inf')}
+    for _ in range(repeat):
+        trace = RecolorTrace()
+        data = recolor_image(path, output_format='PNG', trace=trace, **SCENARIOS[scenario])
+        timings = trace.summary()
+        stages['decode'] = min(stages['decode'], timings['read'])
+        stages['mask'] = min(stages['mask'], timings['mask'])
+        stages['encode'] = min(stages['encode'], timings['encode'])
+    shape = next(record['shape'] for record in trace.records if record['stage'] == 'read')
+    pixels = shape[0] * shape[1]
+    total = sum(stages.values())
+    return {
+        'image': os.path.basename(path),
+        'scenario': scenario,
+        'shape': list(shape[:2]),
+        'pixels': pixels,
+        'seconds': {**stages, 'total': total},
+        'pixels_per_second': pixels / total,
+        'bytes_written': len(data),
+        'peak_rss_bytes': _peak_rss_bytes(),
+    }
+
+
+def make_synthetic(source, sizes, directory):
+    """
+    Upscaled copies of source (longest edge = size), saved as PNG
+    """
+    image = Image.open(source).convert('RGBA')
+    paths = []
+    for size in sizes:
+        scale = size / max(image.size)
+        resized = image.resize((round(image.width * scale), round(image.height * scale)), Image.LANCZOS)
+        path = os.path.join(directory, f"synthetic_{size}.png")
+        resized.save(path, compress_level=1)
+        paths.append(path)
+    return paths
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_pipeline(paths, scenarios, repeat=3, progress=None):
+    """
+    Run every (image, scenario) case in its own child process
+    """
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for path in paths:
+        for scenario in scenarios:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_case, path, scenario, repeat).result()
+            results.append(result)
+            if progress is not None:
+                progress(result)
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare_runs(old, new):
+    """
+    Print total time ratio (old / new, > 1 means faster) for cases present in both runs
+    """
+    old_cases = {(r['image'], r['scenario']): r for r in old['results']}
+    print(f"{'image':20s} {'scenario':15s} {'old ms':>9s} {'new ms':>9s} {'speedup':>8s} {'old MB':>8s} {'new MB':>8s}")
+    for r in new['results']:
+        o = old_cases.get((r['image'], r['scenario']))
+        if o is None:
+            continue
+        old_rss = (o['peak_rss_bytes'] or 0) / 2**20
+        new_rss = (r['peak_rss_bytes'] or 0) / 2**20
+        print(f"{r['image'][:20]:20s} {r['scenario']:15s} {o['seconds']['total'] * 1e3:9.1f} "
+              f"{r['seconds']['total'] * 1e3:9.1f} {o['seconds']['total'] / r['seconds']['total']:8.2f} "
+              f"{old_rss:8.1f} {new_rss:8.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="IconColorModifier benchmarks")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    mask_parser = sub.add_parser('mask', help="compare the float64 matching path with the int32 kernel")
+    mask_parser.add_argument('images', nargs='*', help="images to use (default: images/*)")
+    mask_parser.add_argument('--size', type=int, default=None, help="upscale so the longest edge is SIZE px")
+    mask_parser.add_argument('--tolerance', type=float, default=40)
+    mask_parser.add_argument('--repeat', type=int, default=3)
+    mask_parser.add_argument('--json', action='store_true', help="print JSON instead of a table")
+
+    pipeline_parser = sub.add_parser('pipeline', help="per-stage timing of the documented scenarios, as JSON")
+    pipeline_parser.add_argument('images', nargs='*', help="images to use (default: images/*)")
+    pipeline_parser.add_argument('--sizes', default=','.join(str(s) for s in SYNTHETIC_SIZES),
+                                 help="synthetic upscale sizes, '' to skip")
+    pipeline_parser.add_argument('--synthetic-source', default=SYNTHETIC_SOURCE)
+    pipeline_parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    pipeline_parser.add_argument('--repeat', type=int, default=3)
+    pipeline_parser.add_argument('-o', '--output', default=None, help="write JSON here instead of stdout")
+
+    backends_parser = sub.add_parser('backends', help="time the mask backends and check they agree")
+    backends_parser.add_argument('images', nargs='*', help="images to use (default: images/*)")
+    backends_parser.add_argument('--size', type=int, default=None, help="upscale so the longest edge is SIZE px")
+    backends_parser.add_argument('--backends', default='', help="comma separated (default: all importable)")
+    backends_parser.add_argument('--repeat', type=int, default=3)
+    backends_parser.add_argument('--json', action='store_true', help="print JSON instead of a table")
+
+    compare_parser = sub.add_parser('compare', help="compare two pipeline JSON files")
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+
+    args = parser.parse_args(argv)
+    if args.command == 'pipeline':
+        scenarios = [s for s in args.scenarios.split(',') if s]
+        sizes = [int(s) for s in args.sizes.split(',') if s]
+
+        def print_progress(result):
+            print(f"{result['image']:22s} {result['scenario']:15s} "
+                  f"{result['seconds']['total'] * 1e3:9.1f} ms", file=sys.stderr, flush=True)
+
+        with tempfile.TemporaryDirectory() as directory:
+            paths = (args.images or sample_images()) + make_synthetic(args.synthetic_source, sizes, directory)
+            report = bench_pipeline(paths, scenarios, repeat=args.repeat, progress=print_progress)
+        payload = json.dumps(report, indent=1)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(payload)
+        else:
+            print(payload)
+        return 0
+    if args.command == 'compare':
+        with open(args.old, 'r', encoding='utf-8') as f:
+            old = json.load(f)
+        with open(args.new, 'r', encoding='utf-8') as f:
+            new = json.load(f)
+        compare_runs(old, new)
+        return 0
+    if args.command == 'backends':
+        rows = bench_backends(args.images or sample_images(), size=args.size,
+                              backends=[b for b in args.backends.split(',') if b], repeat=args.repeat)
+        if args.json:
+            print(json.dumps(rows, indent=1))
+        else:
+            print(f"{'image':18s} {'shape':>11s} {'backend':>8s} {'ms':>9s} {'MP/s':>8s} same")
+            for row in rows:
+                shape = 'x'.join(str(v) for v in row['shape'])
+                print(f"{row['image'][:18]:18s} {shape:>11s} {row['backend']:>8s} {row['seconds'] * 1e3:9.1f} "
+                      f"{row['megapixels_per_second']:8.1f} {'yes' if row['identical'] else 'NO'}")
+        return 0 if all(row['identical'] for row in rows) else 1
+    if args.command == 'mask':
+        rows = bench_mask(args.images or sample_images(), size=args.size,
+                          tolerance=args.tolerance, repeat=args.repeat)
+        if args.json:
+            print(json.dumps(rows, indent=1))
+        else:
+            print_mask_table(rows)
+        return 0 if all(row['identical'] for row in rows) else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
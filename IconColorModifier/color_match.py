@@ -0,0 +1,301 @@
+import logging
+import math
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# env var picking the default mask backend: 'numpy', 'numexpr', 'numba' or 'auto'
+BACKEND_ENV = 'ICONCOLOR_BACKEND'
+
+# rows per tile, the int32 scratch buffers are 2 * tile_rows * width * 4 bytes
+DEFAULT_TILE_ROWS = 256
+
+# largest possible squared RGB distance is 3 * 255**2
+MAX_DISTANCE_SQ = 3 * 255 ** 2
+
+
+def tolerance_to_threshold(tolerance):
+    """
+    Convert a Euclidean tolerance to an integer threshold on squared distance.
+    For integer d2: sqrt(d2) < tolerance  <=>  d2 < ceil(tolerance**2)
+    """
+    if tolerance <= 0:
+        return 0
+    return min(int(math.ceil(tolerance * tolerance)), MAX_DISTANCE_SQ + 1)
+
+
+def _iter_tiles(height, tile_rows):
+    for y0 in range(0, height, tile_rows):
+        yield y0, min(y0 + tile_rows, height)
+
+
+def _distance_sq_tile(tile, target, acc, diff):
+    """
+    Write int32 squared distance of a uint8 RGB(A) tile to target into acc
+    """
+    np.subtract(tile[..., 0], target[0], out=acc, dtype=np.int32)
+    np.multiply(acc, acc, out=acc)
+    for c in (1, 2):
+        np.subtract(tile[..., c], target[c], out=diff, dtype=np.int32)
+        np.multiply(diff, diff, out=diff)
+        np.add(acc, diff, out=acc)
+    return acc
+
+
+def color_distance_sq(image, target, out=None, tile_rows=DEFAULT_TILE_ROWS):
+    """
+    Squared RGB distance (int32) between every pixel of a uint8 (H, W, 3|4) image and target.
+    Works tile by tile on the uint8 view, no float copy of the image is made.
+    """
+    height, width = image.shape[:2]
+    target = [int(c) for c in target[:3]]
+    if out is None:
+        out = np.empty((height, width), dtype=np.int32)
+    diff = np.empty((min(tile_rows, height), width), dtype=np.int32)
+    for y0, y1 in _iter_tiles(height, tile_rows):
+        _distance_sq_tile(image[y0:y1], target, out[y0:y1], diff[:y1 - y0])
+    return out
+
+
+def _match_numpy(image, target, threshold, out, tile_rows):
+    height, width = image.shape[:2]
+    rows = min(tile_rows, height)
+    acc = np.empty((rows, width), dtype=np.int32)
+    diff = np.empty((rows, width), dtype=np.int32)
+    for y0, y1 in _iter_tiles(height, tile_rows):
+        n = y1 - y0
+        _distance_sq_tile(image[y0:y1], target, acc[:n], diff[:n])
+        np.less(acc[:n], threshold, out=out[y0:y1])
+    return out
+
+
+def _load_numexpr():
+    import numexpr
+
+    def match(image, target, threshold, out, tile_rows):
+        # numexpr has no uint8 type: widen one tile of channels at a time, evaluate multithreaded;
+        # the scratch is 3 * tile_rows * width * 4 bytes, about 1.5x the numpy backend's
+        t0, t1, t2 = target
+        height, width = image.shape[:2]
+        rows = min(tile_rows, height)
+        channels = np.empty((3, rows, width), dtype=np.int32)
+        for y0, y1 in _iter_tiles(height, rows):
+            n = y1 - y0
+            r, g, b = channels[:, :n]
+            for c, channel in enumerate((r, g, b)):
+                channel[...] = image[y0:y1, :, c]
+            numexpr.evaluate('(r - t0)**2 + (g - t1)**2 + (b - t2)**2 < threshold', out=out[y0:y1])
+        return out
+    return match
+
+
+def _load_numba():
+    import numba
+
+    @numba.njit(parallel=True, cache=True, nogil=True)
+    def kernel(image, t0, t1, t2, threshold, out):
+        height, width = out.shape
+        for y in numba.prange(height):
+            for x in range(width):
+                d0 = np.int32(image[y, x, 0]) - t0
+                d1 = np.int32(image[y, x, 1]) - t1
+                d2 = np.int32(image[y, x, 2]) - t2
+                out[y, x] = d0 * d0 + d1 * d1 + d2 * d2 < threshold
+
+    def match(image, target, threshold, out, tile_rows):
+        kernel(image, np.int32(target[0]), np.int32(target[1]), np.int32(target[2]), np.int32(threshold), out)
+        return out
+    return match
+
+
+BACKEND_LOADERS = {
+    'numpy': lambda: _match_numpy,
+    'numexpr': _load_numexpr,
+    'numba': _load_numba,
+}
+_resolved_backends = {}  # requested name -> (resolved name, match function)
+
+
+def get_backend(name=None):
+    """
+    Resolve a mask backend by name (None: $ICONCOLOR_BACKEND or 'numpy', 'auto': numba if importable).
+    numexpr has to widen uint8 tiles to int32 first, so 'auto' does not pick it; select it explicitly.
+    Missing optional dependencies fall back to the NumPy baseline with a warning.
+    Returns (resolved name, match function).
+    """
+    name = (name or os.environ.get(BACKEND_ENV) or 'numpy').lower()
+    if name in _resolved_backends:
+        return _resolved_backends[name]
+    candidates = ['numba', 'numpy'] if name == 'auto' else [name, 'numpy']
+    for candidate in candidates:
+        if candidate not in BACKEND_LOADERS:
+            raise ValueError(f"Unknown mask backend: {candidate}")
+        try:
+            match = BACKEND_LOADERS[candidate]()
+        except ImportError as e:
+            if name != 'auto':
+                logger.warning("mask backend %r unavailable (%s), using numpy", candidate, e)
+            continue
+        _resolved_backends[name] = (candidate, match)
+        return _resolved_backends[name]
+
+
+def available_backends():
+    """
+    Backends whose dependencies are importable
+    """
+    names = []
+    for name in BACKEND_LOADERS:
+        try:
+            BACKEND_LOADERS[name]()
+            names.append(name)
+        except ImportError:
+            pass
+    return names
+
+
+def color_match_mask(image, target, tolerance, out=None, tile_rows=DEFAULT_TILE_ROWS, backend=None):
+    """
+    Boolean mask of pixels whose RGB distance to target is < tolerance.
+    Same result as np.sqrt(np.sum((image[:, :, :3].astype(float) - target) ** 2, axis=2)) < tolerance,
+    but compares int32 squared distance to tolerance**2, so the only full-size buffer is the mask.
+    backend: 'numpy' (default), 'numexpr', 'numba' or 'auto', see get_backend.
+    """
+    height, width = image.shape[:2]
+    target = [int(c) for c in target[:3]]
+    threshold = tolerance_to_threshold(tolerance)
+    if out is None:
+        out = np.empty((height, width), dtype=bool)
+    if out.size == 0:
+        return out
+    match = get_backend(backend)[1]
+    return match(image, target, threshold, out, tile_rows)
+
+
+def _label_cv2(mask):
+    import cv2
+
+    count, labels = cv2.connectedComponents(mask.view(np.uint8), connectivity=4)
+    return count, labels
+
+
+def _label_scipy(mask):
+    from scipy import ndimage
+
+    labels, count = ndimage.label(mask)
+    return count + 1, labels
+
+
+def _border_connected_numpy(mask):
+    """
+    Pure NumPy fallback: grow the border pixels inside mask until nothing changes.
+    Each step is vectorized, the number of steps is the longest path inside the region.
+    """
+    region = np.zeros_like(mask)
+    region[0], region[-1], region[:, 0], region[:, -1] = mask[0], mask[-1], mask[:, 0], mask[:, -1]
+    while True:
+        grown = region.copy()
+        grown[1:] |= region[:-1]
+        grown[:-1] |= region[1:]
+        grown[:, 1:] |= region[:, :-1]
+        grown[:, :-1] |= region[:, 1:]
+        grown &= mask
+        if np.array_equal(grown, region):
+            return region
+        region = grown
+
+
+def border_connected(mask):
+    """
+    Keep only the parts of a boolean mask that are 4-connected to the image border,
+    e.g. the real background, not bg-colored pixels enclosed by the icon.
+    Uses one connected-component labeling pass (OpenCV, else SciPy, else a NumPy fallback).
+    """
+    if mask.size == 0:
+        return mask.copy()
+    mask = np.ascontiguousarray(mask, dtype=bool)
+    for labeler in (_label_cv2, _label_scipy):
+        try:
+            count, labels = labeler(mask)
+            break
+        except ImportError:
+            continue
+    else:
+        return _border_connected_numpy(mask)
+
+    touches_border = np.zeros(count, dtype=bool)
+    for edge in (labels[0], labels[-1], labels[:, 0], labels[:, -1]):
+        touches_border[edge] = True
+    touches_border[0] = False  # label 0 is the unmatched pixels
+    return touches_border[labels]
+
+
+def _border_samples(image, band, max_samples):
+    """
+    Pixels of the outer band of the image, strided down to about max_samples
+    """
+    band = border_band(image.shape[0], image.shape[1], band)
+    return _edge_samples(image[:band], image[-band:], image[band:-band, :band], image[band:-band, -band:],
+                         max_samples)
+
+
+def border_band(height, width, band=2):
+    """
+    Width of the border band actually sampled for an image of this size
+    """
+    return max(1, min(band, height // 2 or 1, width // 2 or 1))
+
+
+def _edge_samples(top, bottom, left, right, max_samples):
+    """
+    Pixels of the four edges of the band (left / right without the top and bottom rows),
+    strided down to about max_samples
+    """
+    strips = [edge.reshape(-1, edge.shape[2]) for edge in (top, bottom, left, right)]
+    total = sum(len(strip) for strip in strips)
+    step = max(1, -(-total // max_samples))
+    return np.concatenate([strip[::step] for strip in strips])
+
+
+def estimate_background(image, target=None, band=2, max_samples=4096, min_opaque=0.1):
+    """
+    Estimate the bg color and a matching tolerance from a sample of the border pixels.
+    The color is the median of the most common 4-bit-per-channel bin (a 4096-bin bincount),
+    the tolerance grows with the spread of the border pixels around it.
+    target: use this bg color and only suggest the tolerance.
+    Returns (rgb array, tolerance), or (None, None) if the border is already transparent.
+    """
+    return _estimate_from_samples(_border_samples(image, band, max_samples), target, min_opaque)
+
+
+def estimate_background_edges(top, bottom, left, right, target=None, max_samples=4096, min_opaque=0.1):
+    """
+    estimate_background for an image that is not in memory, given only its border band:
+    top / bottom rows and left / right columns without those rows (see border_band)
+    """
+    return _estimate_from_samples(_edge_samples(top, bottom, left, right, max_samples), target, min_opaque)
+
+
+def _estimate_from_samples(samples, target, min_opaque):
+    if samples.shape[1] == 4:
+        opaque = samples[:, 3] >= 128
+        if opaque.mean() < min_opaque:
+            return None, None
+        samples = samples[opaque]
+    rgb = samples[:, :3].astype(np.int32)
+
+    if target is None:
+        quantized = rgb >> 4
+        bins = (quantized[:, 0] << 8) | (quantized[:, 1] << 4) | quantized[:, 2]
+        mode_bin = np.bincount(bins, minlength=4096).argmax()
+        target = np.median(rgb[bins == mode_bin], axis=0).round().astype(np.int32)
+    else:
+        target = np.asarray(target[:3], dtype=np.int32)
+
+    distance = np.sqrt(((rgb - target) ** 2).sum(axis=1))
+    near = distance[distance < 64]  # the bg cluster, not fg touching the border
+    spread = np.percentile(near, 95) if near.size else 0.0
+    tolerance = float(np.clip(1.5 * spread + 12, 12, 96))
+    return target, round(tolerance, 1)
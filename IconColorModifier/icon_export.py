@@ -0,0 +1,127 @@
+import argparse
+import logging
+import os
+
+from PIL import Image
+
+from IconColorModify import recolor_image
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = (16, 32, 64, 128, 256, 512)
+ICO_MAX_SIZE = 256
+
+
+def _square(image):
+    """
+    Center a non-square image on a transparent square canvas
+    """
+    side = max(image.size)
+    if image.width == image.height:
+        return image
+    canvas = Image.new(image.mode, (side, side))
+    canvas.paste(image, ((side - image.width) // 2, (side - image.height) // 2))
+    return canvas
+
+
+def build_pyramid(image, sizes):
+    """
+    Resize a square RGBA image to every size, each level below source resolution computed from the
+    previous (larger) one; upscaled levels are made from the source and never chained from.
+    Works on premultiplied alpha so transparent pixels don't bleed color into edges.
+    Returns {size: RGBA image}.
+    """
+    source = _square(image).convert('RGBa')
+    levels = {}
+    previous = source
+    for size in sorted(set(sizes), reverse=True):
+        if size >= source.width:
+            level = source.resize((size, size), Image.LANCZOS) if size > source.width else source
+        elif previous.width == 2 * size:
+            level = previous.reduce(2)  # exact halving, box filter
+        else:
+            level = previous.resize((size, size), Image.LANCZOS, reducing_gap=2.0)
+        levels[size] = level
+        if size <= source.width:
+            previous = level
+    return {size: level.convert('RGBA') for size, level in levels.items()}
+
+
+def export_icon_sizes(
+    input_path,
+    output_dir,
+    sizes=DEFAULT_SIZES,   # square output sizes in px
+    name=None,             # output file prefix, default: input file name
+    ico=False,             # also write name.ico with all sizes <= 256
+    sprite=False,          # also write name_sprite.png, all sizes in one row
+    cache=None,            # optional DecodedImageCache
+    **recolor_kwargs       # color options, see modify_image_colors
+):
+    """
+    Decode and recolor once at source resolution, then write every size from a resize pyramid.
+    Returns {'sizes': {size: path}, 'ico': path or None, 'sprite': path or None}.
+    """
+    # ===[1. decode and mask once]===
+    rgba = recolor_image(input_path, cache=cache, **recolor_kwargs)
+
+    # ===[2. resize pyramid]===
+    levels = build_pyramid(Image.fromarray(rgba), sizes)
+
+    # ===[3. write all sizes]===
+    os.makedirs(output_dir, exist_ok=True)
+    name = name or os.path.splitext(os.path.basename(input_path))[0]
+    result = {'sizes': {}, 'ico': None, 'sprite': None}
+    for size in sorted(levels):
+        path = os.path.join(output_dir, f"{name}_{size}.png")
+        levels[size].save(path)
+        result['sizes'][size] = path
+
+    if ico:
+        ico_sizes = sorted((size for size in levels if size <= ICO_MAX_SIZE), reverse=True)
+        if ico_sizes:
+            path = os.path.join(output_dir, f"{name}.ico")
+            frames = [levels[size] for size in ico_sizes]
+            frames[0].save(path, format='ICO', sizes=[(size, size) for size in ico_sizes],
+                           append_images=frames[1:])
+            result['ico'] = path
+
+    if sprite:
+        ordered = sorted(levels)
+        sheet = Image.new('RGBA', (sum(ordered), max(ordered)))
+        x = 0
+        for size in ordered:
+            sheet.paste(levels[size], (x, 0))
+            x += size
+        path = os.path.join(output_dir, f"{name}_sprite.png")
+        sheet.save(path)
+        result['sprite'] = path
+
+    logger.info("%d sizes saved to %s", len(levels), output_dir)
+    return result
+
+
+def main(argv=None):
+    from batch_modify import add_spec_arguments, spec_from_args
+
+    parser = argparse.ArgumentParser(description="Export one icon at many sizes from a single decode.")
+    parser.add_argument('input', help="source image")
+    parser.add_argument('output_dir')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES), help="comma separated px sizes")
+    parser.add_argument('--name', default=None, help="output file prefix")
+    parser.add_argument('--ico', action='store_true', help="also write an .ico")
+    parser.add_argument('--sprite', action='store_true', help="also write a sprite sheet")
+    add_spec_arguments(parser)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    export_icon_sizes(
+        args.input, args.output_dir,
+        sizes=[int(s) for s in args.sizes.split(',')],
+        name=args.name, ico=args.ico, sprite=args.sprite,
+        **spec_from_args(args)
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,76 @@
+import os
+import threading
+from collections import OrderedDict
+
+from IconColorModify import read_image
+
+
+class DecodedImageCache:
+    """
+    In-process LRU cache of decoded uint8 RGBA arrays, keyed by path + mtime + size
+    and bounded by the total bytes of the cached arrays.
+    Cached arrays are read-only; modify_image_colors never writes into its source array.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20, loader=read_image):
+        self.max_bytes = max_bytes
+        self.loader = loader
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # abspath -> (mtime_ns, size, array)
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Return the decoded image, decoding (and caching) it on a miss
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        # decode outside the lock so other threads can keep hitting the cache
+        image = self.loader(path)
+        image.setflags(write=False)
+        with self._lock:
+            self._discard(path)
+            if image.nbytes <= self.max_bytes:
+                self._entries[path] = (stat.st_mtime_ns, stat.st_size, image)
+                self.current_bytes += image.nbytes
+                while self.current_bytes > self.max_bytes:
+                    self._discard(next(iter(self._entries)))
+                    self.evictions += 1
+        return image
+
+    def _discard(self, path):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self.current_bytes -= entry[2].nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def __len__(self):
+        return len(self._entries)
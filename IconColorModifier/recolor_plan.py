@@ -0,0 +1,179 @@
+import json
+import logging
+
+import numpy as np
+from PIL import Image
+
+from IconColorModify import parse_color, read_image
+from color_match import DEFAULT_TILE_ROWS, tolerance_to_threshold
+
+logger = logging.getLogger(__name__)
+
+MAX_RULES = 255  # rule ids are stored as uint8, 0 means no rule
+
+
+class RecolorPlan:
+    """
+    Many (target, new, tolerance) recolor rules compiled into one lookup table.
+
+    mode='exact': 2^24 entry table indexed by the full RGB value (16 MB), same matching as modify_image_colors.
+    mode='cube':  (2^bits)^3 table indexed by quantized RGB (bits=5 -> 32 KB, bits=6 -> 256 KB),
+                  rules are evaluated at the cell centers, so matches near the tolerance edge are approximate.
+
+    Applying the plan is one table gather per pixel, whatever the number of rules.
+    Rules are matched against the source colors and the first matching rule wins.
+    new=None makes matching pixels transparent, otherwise their RGB is replaced.
+    """
+
+    def __init__(self, rules=(), mode='exact', bits=6):
+        if mode not in ('exact', 'cube'):
+            raise ValueError(f"Unknown plan mode: {mode}")
+        if mode == 'cube' and not 1 <= int(bits) <= 7:
+            raise ValueError(f"Cube bits must be between 1 and 7, got {bits}")
+        self.mode = mode
+        self.bits = 8 if mode == 'exact' else int(bits)
+        self.rules = []
+        self.lut = None
+        for rule in rules:
+            self.add_rule(*rule)
+
+    def add_rule(self, target, new=None, tolerance=40):
+        """
+        Add one rule; colors accept RGB, RGBA or HEX like modify_image_colors
+        """
+        if len(self.rules) >= MAX_RULES:
+            raise ValueError(f"A plan holds at most {MAX_RULES} rules")
+        new = parse_color(new)
+        self.rules.append({
+            'target': [int(c) for c in parse_color(target)],
+            'new': None if new is None else [int(c) for c in new],
+            'tolerance': float(tolerance),
+        })
+        self.lut = None  # needs recompiling
+        return self
+
+    # ===[compile]===
+    def compile(self):
+        size = 1 << (3 * self.bits)
+        lut = np.zeros(size, dtype=np.uint8)
+        # later rules first, so earlier rules overwrite them and win
+        for rule_id in range(len(self.rules), 0, -1):
+            rule = self.rules[rule_id - 1]
+            if self.mode == 'exact':
+                self._compile_exact_rule(lut, rule, rule_id)
+            else:
+                self._compile_cube_rule(lut, rule, rule_id)
+        self.lut = lut
+        self._build_palette()
+        return self
+
+    def _compile_exact_rule(self, lut, rule, rule_id):
+        """
+        Only the bounding box of the tolerance sphere is visited, one red plane at a time
+        """
+        threshold = tolerance_to_threshold(rule['tolerance'])
+        if threshold == 0:
+            return
+        radius = int(np.ceil(rule['tolerance']))
+        lows = [max(c - radius, 0) for c in rule['target']]
+        highs = [min(c + radius, 255) for c in rule['target']]
+        g = np.arange(lows[1], highs[1] + 1, dtype=np.int32)
+        b = np.arange(lows[2], highs[2] + 1, dtype=np.int32)
+        gb_dist = (g[:, None] - rule['target'][1]) ** 2 + (b[None, :] - rule['target'][2]) ** 2
+        gb_index = (g[:, None] << 8) | b[None, :]
+        for r in range(lows[0], highs[0] + 1):
+            inside = gb_dist < threshold - (r - rule['target'][0]) ** 2
+            lut[(r << 16) | gb_index[inside]] = rule_id
+
+    def _compile_cube_rule(self, lut, rule, rule_id):
+        shift = 8 - self.bits
+        centers = (np.arange(1 << self.bits, dtype=np.int32) << shift) + ((1 << shift) >> 1)
+        r, g, b = (centers - c for c in rule['target'])
+        dist = r[:, None, None] ** 2 + g[None, :, None] ** 2 + b[None, None, :] ** 2
+        inside = dist.ravel() < tolerance_to_threshold(rule['tolerance'])
+        lut[inside] = rule_id
+
+    def _build_palette(self):
+        count = len(self.rules) + 1
+        self._new_rgb = np.zeros((count, 3), dtype=np.uint8)
+        self._sets_rgb = np.zeros(count, dtype=bool)
+        self._clears_alpha = np.zeros(count, dtype=bool)
+        for rule_id, rule in enumerate(self.rules, start=1):
+            if rule['new'] is None:
+                self._clears_alpha[rule_id] = True
+            else:
+                self._sets_rgb[rule_id] = True
+                self._new_rgb[rule_id] = rule['new']
+
+    # ===[apply]===
+    def rule_ids(self, image, tile_rows=DEFAULT_TILE_ROWS):
+        """
+        uint8 id of the rule matching each pixel of a uint8 RGB(A) image (0 = none)
+        """
+        if self.lut is None:
+            self.compile()
+        height, width = image.shape[:2]
+        shift = 8 - self.bits
+        ids = np.empty((height, width), dtype=np.uint8)
+        key = np.empty((min(tile_rows, height), width), dtype=np.int32)
+        for y0 in range(0, height, tile_rows):
+            tile = image[y0:y0 + tile_rows]
+            k = key[:tile.shape[0]]
+            np.right_shift(tile[..., 0], shift, out=k, dtype=np.int32)
+            for c in (1, 2):
+                np.left_shift(k, self.bits, out=k)
+                k |= tile[..., c] >> shift
+            np.take(self.lut, k, out=ids[y0:y0 + tile_rows])
+        return ids
+
+    def apply(self, image, out=None, tile_rows=DEFAULT_TILE_ROWS):
+        """
+        Recolor a uint8 RGBA image, returns out (a new array unless given; may be image itself)
+        """
+        if out is None:
+            out = image.copy()
+        elif out is not image:
+            out[...] = image
+        for y0 in range(0, image.shape[0], tile_rows):
+            ids = self.rule_ids(image[y0:y0 + tile_rows], tile_rows)
+            tile = out[y0:y0 + tile_rows]
+            sets_rgb = self._sets_rgb[ids]
+            for c in range(3):
+                np.copyto(tile[..., c], self._new_rgb[:, c][ids], where=sets_rgb)
+            np.copyto(tile[..., 3], 0, where=self._clears_alpha[ids])
+        return out
+
+    def apply_file(self, input_path, output_path, cache=None):
+        if cache is None:
+            image = read_image(input_path)
+            output_image = self.apply(image, out=image)
+        else:  # cached arrays are shared, never recolor them in place
+            output_image = self.apply(cache.get(input_path))
+        Image.fromarray(output_image).save(output_path)
+        logger.info("image saved to %s", output_path)
+
+    # ===[serialize]===
+    def save(self, path):
+        """
+        Save rules and the compiled table (.npz), so later runs skip compiling
+        """
+        if self.lut is None:
+            self.compile()
+        np.savez_compressed(
+            path,
+            lut=self.lut,
+            meta=np.array(json.dumps({'mode': self.mode, 'bits': self.bits, 'rules': self.rules}))
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            plan = cls(mode=meta['mode'], bits=meta['bits'])
+            plan.rules = meta['rules']
+            lut = data['lut']
+        if lut.shape != (1 << (3 * plan.bits),) or lut.dtype != np.uint8:
+            raise ValueError(f"Corrupt recolor plan: {path}")
+        plan.lut = lut
+        plan._build_palette()
+        return plan
@@ -0,0 +1,111 @@
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class RecolorTrace:
+    """
+    Collects per-stage durations, array sizes and bytes written of recolor calls.
+
+        trace = RecolorTrace(callback=lambda record: print(record))
+        modify_image_colors("in.png", "out.png", trace=trace)
+        trace.summary()  # {'parse_color': ..., 'read': ..., 'mask': ..., 'save': ...}
+
+    Each record is a dict: {'stage', 'seconds', 'shape', 'nbytes', 'bytes_written'}.
+    profile=True also captures cProfile stats and tracemalloc peak memory for the outermost call.
+    """
+
+    def __init__(self, callback=None, profile=False):
+        self.callback = callback
+        self.profile = profile
+        self.records = []
+        self.profile_stats = None   # pstats.Stats of the last profiled call
+        self.memory_peak = None     # tracemalloc peak bytes of the last profiled call
+        self.memory_top = None      # top allocation sites (tracemalloc.Statistic) of the last profiled call
+        self._depth = 0
+        self._profiler = None
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time one stage; the yielded record can be filled with shape / nbytes / bytes_written
+        """
+        record = {'stage': name, 'seconds': 0.0, 'shape': None, 'nbytes': None, 'bytes_written': None}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            self.records.append(record)
+            if self.callback is not None:
+                self.callback(record)
+
+    @contextmanager
+    def call(self):
+        """
+        Wrap a whole recolor call; profiling only starts/stops at the outermost level
+        """
+        outermost = self._depth == 0
+        self._depth += 1
+        if outermost and self.profile:
+            self._start_profile()
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if outermost and self.profile:
+                self._stop_profile()
+
+    def _start_profile(self):
+        self._started_tracemalloc = not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+
+    def _stop_profile(self):
+        self._profiler.disable()
+        self.profile_stats = pstats.Stats(self._profiler)
+        self._profiler = None
+        self.memory_peak = tracemalloc.get_traced_memory()[1]
+        self.memory_top = tracemalloc.take_snapshot().statistics('lineno')[:10]
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+    def summary(self):
+        """
+        Total seconds per stage over all recorded calls
+        """
+        totals = {}
+        for record in self.records:
+            totals[record['stage']] = totals.get(record['stage'], 0.0) + record['seconds']
+        return totals
+
+    def profile_text(self, limit=20, sort='cumulative'):
+        if self.profile_stats is None:
+            return ''
+        out = io.StringIO()
+        self.profile_stats.stream = out
+        self.profile_stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+class _NullTrace:
+    """
+    Stand-in used when no trace is passed, keeps the call sites free of if-checks
+    """
+
+    @contextmanager
+    def stage(self, name):
+        yield {}
+
+    @contextmanager
+    def call(self):
+        yield self
+
+
+NULL_TRACE = _NullTrace()
@@ -0,0 +1,212 @@
+import logging
+import os
+import struct
+import zlib
+
+import numpy as np
+from PIL import Image
+
+from color_match import border_band, estimate_background_edges
+from IconColorModify import apply_color_masks, keeps_high_byte, parse_color, pil_image_to_rgba
+
+logger = logging.getLogger(__name__)
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+IDAT_CHUNK_BYTES = 1 << 20
+FILTER_CHUNK_BYTES = 1 << 18
+
+
+def _filter_rows(flat, previous_row):
+    """
+    PNG-filter a strip of RGBA rows (n, width * 4) given the raw row above it.
+    All five filters only look at raw neighbours, so each is one vectorized expression;
+    every row keeps the filter with the smallest sum of absolute signed bytes (libpng heuristic).
+    """
+    n, row_bytes = flat.shape
+    x = flat.astype(np.int16)
+    b = np.empty_like(x)  # up
+    b[0] = previous_row
+    b[1:] = x[:-1]
+    a = np.zeros_like(x)  # left
+    a[:, 4:] = x[:, :-4]
+    c = np.zeros_like(x)  # up-left
+    c[:, 4:] = b[:, :-4]
+
+    pa = np.abs(b - c)
+    pb = np.abs(a - c)
+    pc = np.abs(a + b - 2 * c)
+    paeth = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+    candidates = np.stack([x, x - a, x - b, x - ((a + b) >> 1), x - paeth]).astype(np.uint8)
+
+    scores = np.abs(candidates.view(np.int8).astype(np.int16)).sum(axis=2, dtype=np.int64)
+    best = scores.argmin(axis=0)
+    filtered = np.empty((n, row_bytes + 1), dtype=np.uint8)
+    filtered[:, 0] = best
+    filtered[:, 1:] = candidates[best, np.arange(n)]
+    return filtered
+
+
+class PNGStreamWriter:
+    """
+    Write an 8-bit RGBA PNG strip by strip, only one strip and the zlib state are held in memory.
+    """
+
+    def __init__(self, output_path, width, height, compress_level=6):
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._file = open(output_path, 'wb')
+        self._compressor = zlib.compressobj(compress_level)
+        self._pending = []
+        self._pending_bytes = 0
+        self._previous_row = np.zeros(width * 4, dtype=np.uint8)
+        self._file.write(PNG_SIGNATURE)
+        # IHDR: width, height, bit depth 8, color type 6 (RGBA), compression, filter, interlace
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+
+    def _write_chunk(self, chunk_type, data):
+        self._file.write(struct.pack('>I', len(data)))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type))))
+
+    def _flush_idat(self):
+        if self._pending:
+            self._write_chunk(b'IDAT', b''.join(self._pending))
+            self._pending = []
+            self._pending_bytes = 0
+
+    def write_rows(self, rows):
+        """
+        rows: uint8 array of shape (n, width, 4)
+        """
+        n = rows.shape[0]
+        if rows.shape[1:] != (self.width, 4) or self.rows_written + n > self.height:
+            raise ValueError(f"Unexpected strip shape {rows.shape} at row {self.rows_written}")
+        flat = rows.reshape(n, self.width * 4)
+        # filter a few rows at a time, the int16 filter temporaries stay around FILTER_CHUNK_BYTES each
+        step = max(1, FILTER_CHUNK_BYTES // flat.shape[1])
+        for y0 in range(0, n, step):
+            chunk = flat[y0:y0 + step]
+            filtered = _filter_rows(chunk, self._previous_row)
+            self._previous_row = chunk[-1]
+            data = self._compressor.compress(filtered.tobytes())
+            if data:
+                self._pending.append(data)
+                self._pending_bytes += len(data)
+                if self._pending_bytes >= IDAT_CHUNK_BYTES:
+                    self._flush_idat()
+        self._previous_row = self._previous_row.copy()
+        self.rows_written += n
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"Only {self.rows_written} of {self.height} rows written")
+            self._pending.append(self._compressor.flush())
+            self._flush_idat()
+            self._write_chunk(b'IEND', b'')
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+def _open_source(input_path):
+    """
+    Open input lazily. Returns (width, height, read_strip(y0, y1, x0=0, x1=width) -> uint8 RGBA array).
+    .npy files (H, W, 3|4 uint8) are memory-mapped, so nothing but the strip is resident;
+    other formats are decoded once by PIL in their native mode and cropped strip by strip.
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Input image not found: {input_path}")
+
+    if input_path.lower().endswith('.npy'):
+        source = np.load(input_path, mmap_mode='r')
+        if source.ndim != 3 or source.shape[2] not in (3, 4) or source.dtype != np.uint8:
+            raise ValueError(f"Expected uint8 (H, W, 3|4) array in {input_path}, got {source.dtype} {source.shape}")
+        height, width = source.shape[:2]
+
+        def read_strip(y0, y1, x0=0, x1=width):
+            strip = np.empty((y1 - y0, x1 - x0, 4), dtype=np.uint8)
+            strip[:, :, :source.shape[2]] = source[y0:y1, x0:x1]
+            if source.shape[2] == 3:
+                strip[:, :, 3] = 255
+            return strip
+        return width, height, read_strip
+
+    image = Image.open(input_path)
+    width, height = image.size
+    high_byte = keeps_high_byte(image)  # decided on the whole image, like load_image
+
+    def read_strip(y0, y1, x0=0, x1=width):
+        # same mode conversion as load_image (16-bit grayscale keeps the high byte instead of clipping)
+        return pil_image_to_rgba(image.crop((x0, y0, x1, y1)), high_byte)
+    return width, height, read_strip
+
+
+def modify_image_colors_tiled(
+    input_path,
+    output_path,                      # always written as PNG
+    target_bg_color=(255, 255, 255),
+    new_bg_color=None,
+    target_fg_color=None,
+    new_fg_color=None,
+    change_all_fg=False,
+    invert_mask=False,
+    tolerance=40,
+    edge_mode='hard',
+    soft_tolerance=None,
+    decontaminate=False,
+    backend=None,                     # mask backend, see color_match.get_backend
+    tile_rows=256,                    # rows per strip, bounds the working set
+    compress_level=6                  # zlib level of the output PNG
+):
+    """
+    Same result as modify_image_colors, but reads, masks and writes strips of tile_rows rows,
+    so the full-resolution RGBA working/output buffers are never allocated.
+    target_bg_color / tolerance 'auto' are estimated from the border band, read before streaming.
+    """
+    # ===[1. parse color]===
+    auto_bg = isinstance(target_bg_color, str) and target_bg_color == 'auto'
+    auto_tolerance = isinstance(tolerance, str) and tolerance == 'auto'
+    target_bg_color = None if auto_bg else parse_color(target_bg_color)
+    new_bg_color = parse_color(new_bg_color)
+    target_fg_color = parse_color(target_fg_color)
+    new_fg_color = parse_color(new_fg_color)
+
+    # ===[2. open source and output stream]===
+    width, height, read_strip = _open_source(input_path)
+
+    # ===[2b. detect bg color / tolerance from the border band only]===
+    if auto_bg or auto_tolerance:
+        band = border_band(height, width)
+        detected_color, detected_tolerance = estimate_background_edges(
+            read_strip(0, band), read_strip(height - band, height),
+            read_strip(band, height - band, 0, band), read_strip(band, height - band, width - band, width),
+            target=None if auto_bg else target_bg_color)
+        if auto_bg:
+            target_bg_color = detected_color
+        if auto_tolerance:
+            tolerance = detected_tolerance if detected_tolerance is not None else 40
+        logger.debug("detected bg color %s, tolerance %s", target_bg_color, tolerance)
+
+    # ===[3. read, mask and write strip by strip]===
+    with PNGStreamWriter(output_path, width, height, compress_level) as writer:
+        for y0 in range(0, height, tile_rows):
+            strip = read_strip(y0, min(y0 + tile_rows, height))
+            # masks are computed before any write, so the strip can be updated in place
+            apply_color_masks(strip, strip, target_bg_color, new_bg_color,
+                              target_fg_color, new_fg_color, change_all_fg, invert_mask, tolerance,
+                              edge_mode, soft_tolerance, decontaminate, backend=backend)
+            writer.write_rows(strip)
+    logger.info("image saved to %s", output_path)
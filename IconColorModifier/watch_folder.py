@@ -0,0 +1,324 @@
+import argparse
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_modify import (
+    _recolor_one, add_spec_arguments, collect_inputs, load_manifest, output_paths,
+    params_hash, save_manifest, spec_from_args
+)
+
+logger = logging.getLogger(__name__)
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    sha256 of the file content, read in chunks
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FolderWatcher:
+    """
+    Keeps output_dir in sync with the images under source_dir.
+
+        watcher = FolderWatcher("drop/", "drop/outputs", spec={'tolerance': 40})
+        watcher.run()  # until KeyboardInterrupt or watcher.stop()
+
+    Every scan compares the tree with the manifest (shared with batch_modify): files whose
+    mtime/size changed are hashed, and only a different content hash or different parameters
+    queue a recolor. A file is queued once its size/mtime stayed the same for `debounce` seconds,
+    so bursts of writes (copies, saves from an editor) become one job. At most `workers * 2` jobs
+    are in flight. Outputs of deleted sources are removed.
+    Polls every `interval` seconds; with watchdog installed, file system events wake it up early.
+    """
+
+    def __init__(self, source_dir, output_dir, spec=None, workers=None, recursive=True,
+                 interval=2.0, debounce=1.0, use_watchdog=True):
+        if not os.path.isdir(source_dir):
+            raise NotADirectoryError(f"Watch folder not found: {source_dir}")
+        self.source_dir = os.path.abspath(source_dir)
+        self.output_dir = os.path.abspath(output_dir)
+        self.spec = dict(spec or {})
+        self.spec_hash = params_hash(self.spec)
+        self.workers = workers or os.cpu_count() or 1
+        self.recursive = recursive
+        self.interval = interval
+        self.debounce = debounce
+        self.use_watchdog = use_watchdog
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.manifest = load_manifest(self.output_dir)
+        self.stats = {'processed': 0, 'unchanged': 0, 'removed': 0, 'errors': 0}
+        self._settling = {}   # key -> (stat, first seen), waiting for the file to stop changing
+        self._queue = []      # (key, input_path, output_path, stat, digest) ready to submit
+        self._in_flight = {}  # future -> (key, input_path, output_path, stat, digest)
+        self._failed = {}     # key -> stat of the failed version, retried once the file changes
+        self._collisions = set()  # keys whose output name is taken by another source, reported once
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._executor = None
+        self._observer = None
+
+    # ===[scan]===
+    def _snapshot(self):
+        """
+        {manifest key: (input_path, (mtime_ns, size), output_path)} of the images currently in the folder;
+        output_path is None when another source takes its output name (see output_paths)
+        """
+        _, paths = collect_inputs(self.source_dir, recursive=self.recursive)
+        paths = [p for p in paths if os.path.commonpath([p, self.output_dir]) != self.output_dir]
+        outputs = output_paths(paths, self.source_dir, self.output_dir)
+        snapshot = {}
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:  # deleted between listing and stat
+                continue
+            snapshot[os.path.relpath(path, self.source_dir)] = (
+                path, (stat.st_mtime_ns, stat.st_size), outputs[path])
+        return snapshot
+
+    def _is_current(self, key, stat, output_path):
+        entry = self.manifest.get(key)
+        if not entry or entry.get('params') != self.spec_hash:
+            return False
+        if (entry.get('mtime_ns'), entry.get('size')) != stat:
+            return False
+        if entry['output'] != os.path.relpath(output_path, self.output_dir):  # renamed by a new sibling
+            return False
+        return os.path.exists(output_path)
+
+    def scan(self, now=None):
+        """
+        One pass: remove stale outputs, debounce changed files and queue the settled ones.
+        Returns True if the manifest changed.
+        """
+        now = time.monotonic() if now is None else now
+        snapshot = self._snapshot()
+        busy = {job[0] for job in self._in_flight.values()} | {job[0] for job in self._queue}
+        changed = False
+
+        # ===[1. source deleted -> remove its output, unless that name now belongs to another source]===
+        owned = {os.path.relpath(job[2], self.output_dir) for job in snapshot.values() if job[2] is not None}
+        for key in [k for k in self.manifest if k not in snapshot and k not in busy]:
+            entry = self.manifest.pop(key)
+            if entry['output'] not in owned:
+                self._remove_output(entry)
+            changed = True
+        for key in [k for k in self._settling if k not in snapshot]:
+            del self._settling[key]
+
+        # ===[2. new or modified -> wait until it stops changing]===
+        for key, (input_path, stat, output_path) in snapshot.items():
+            if output_path is None:
+                if key not in self._collisions:
+                    self._collisions.add(key)
+                    self.stats['errors'] += 1
+                    logger.error("skipped %s: output name collides with another source", input_path)
+                self._settling.pop(key, None)
+                continue
+            self._collisions.discard(key)
+            if key in busy or self._failed.get(key) == stat or self._is_current(key, stat, output_path):
+                self._settling.pop(key, None)
+                continue
+            seen = self._settling.get(key)
+            if seen is None or seen[0] != stat:
+                self._settling[key] = (stat, now)
+                if self.debounce > 0:
+                    continue
+            elif now - seen[1] < self.debounce:
+                continue
+            del self._settling[key]
+            self._failed.pop(key, None)
+            changed |= self._enqueue(key, input_path, stat, output_path)
+        return changed
+
+    def _enqueue(self, key, input_path, stat, output_path):
+        """
+        Queue a settled file unless only its mtime changed (same content and params)
+        """
+        try:
+            digest = file_digest(input_path)
+        except OSError:
+            return False
+        entry = self.manifest.get(key)
+        if (entry and entry.get('sha256') == digest and entry.get('params') == self.spec_hash
+                and entry['output'] == os.path.relpath(output_path, self.output_dir)
+                and os.path.exists(output_path)):
+            entry['mtime_ns'], entry['size'] = stat
+            self.stats['unchanged'] += 1
+            return True
+        self._queue.append((key, input_path, output_path, stat, digest))
+        return False
+
+    def _remove_output(self, entry):
+        output_path = os.path.join(self.output_dir, entry['output'])
+        try:
+            os.remove(output_path)
+            logger.info("removed stale output %s", output_path)
+        except FileNotFoundError:
+            pass
+        # prune folders left empty, never the output dir itself
+        folder = os.path.dirname(output_path)
+        while folder != self.output_dir and os.path.commonpath([folder, self.output_dir]) == self.output_dir:
+            try:
+                os.rmdir(folder)
+            except OSError:
+                break
+            folder = os.path.dirname(folder)
+        self.stats['removed'] += 1
+
+    # ===[process]===
+    def dispatch(self):
+        """
+        Submit queued files while fewer than workers * 2 jobs are in flight
+        """
+        if self._executor is None and self._queue:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        while self._queue and len(self._in_flight) < self.workers * 2:
+            job = self._queue.pop(0)
+            future = self._executor.submit(_recolor_one, job[1], job[2], self.spec)
+            future.add_done_callback(lambda _: self._wake.set())
+            self._in_flight[future] = job
+
+    def collect(self):
+        """
+        Record finished jobs in the manifest. Returns True if the manifest changed.
+        Jobs cancelled by close() are dropped; they are not in the manifest, so the next run queues them again.
+        """
+        changed = False
+        for future in [f for f in self._in_flight if f.done()]:
+            key, input_path, output_path, stat, digest = self._in_flight.pop(future)
+            if future.cancelled():
+                continue
+            try:
+                seconds = future.result()
+            except Exception as e:
+                self._failed[key] = stat
+                self.manifest.pop(key, None)
+                self.stats['errors'] += 1
+                logger.error("failed %s: %s: %s", input_path, type(e).__name__, e)
+            else:
+                self.manifest[key] = {'mtime_ns': stat[0], 'size': stat[1], 'sha256': digest,
+                                      'params': self.spec_hash,
+                                      'output': os.path.relpath(output_path, self.output_dir)}
+                self.stats['processed'] += 1
+                logger.info("recolored %s in %.2fs", input_path, seconds)
+            changed = True
+        return changed
+
+    def step(self, now=None):
+        """
+        scan + dispatch + collect, saving the manifest when it changed
+        """
+        changed = self.collect()
+        changed |= self.scan(now)
+        self.dispatch()
+        if changed:
+            save_manifest(self.output_dir, self.manifest)
+
+    @property
+    def idle(self):
+        return not (self._settling or self._queue or self._in_flight)
+
+    # ===[loop]===
+    def _start_observer(self):
+        """
+        Wake the loop on file system events if watchdog is installed, else rely on polling
+        """
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            logger.info("watchdog not installed, polling every %.1fs", self.interval)
+            return
+
+        wake = self._wake
+
+        class WakeHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wake.set()
+
+        self._observer = Observer()
+        self._observer.schedule(WakeHandler(), self.source_dir, recursive=self.recursive)
+        self._observer.start()
+
+    def run(self, once=False):
+        """
+        Watch until stop() (or KeyboardInterrupt). once=True syncs the folder a single time and returns.
+        """
+        if once:
+            debounce, self.debounce = self.debounce, 0
+        elif self.use_watchdog:
+            self._start_observer()
+        try:
+            while not self._stopped.is_set():
+                self._wake.clear()
+                self.step()
+                if once and self.idle:
+                    break
+                # settling files need a rescan after the debounce even without new events
+                timeout = min(self.interval, self.debounce) if self._settling else self.interval
+                self._wake.wait(timeout)
+        finally:
+            if once:
+                self.debounce = debounce
+            self.close()
+        return self.stats
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def close(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            self.collect()
+        save_manifest(self.output_dir, self.manifest)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch a folder and recolor new or changed images.")
+    parser.add_argument('source_dir', help="folder to watch")
+    parser.add_argument('output_dir', help="output directory, mirrors the source tree")
+    add_spec_arguments(parser)
+    parser.add_argument('--workers', type=int, default=None, help="process count (default: all cores)")
+    parser.add_argument('--no-recursive', action='store_true')
+    parser.add_argument('--interval', type=float, default=2.0, help="seconds between polls")
+    parser.add_argument('--debounce', type=float, default=1.0,
+                        help="seconds a file must stay unchanged before it is processed")
+    parser.add_argument('--poll', action='store_true', help="don't use watchdog events, only poll")
+    parser.add_argument('--once', action='store_true', help="sync once and exit")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    watcher = FolderWatcher(
+        args.source_dir, args.output_dir, spec_from_args(args),
+        workers=args.workers,
+        recursive=not args.no_recursive,
+        interval=args.interval,
+        debounce=args.debounce,
+        use_watchdog=not args.poll
+    )
+    try:
+        stats = watcher.run(once=args.once)
+    except KeyboardInterrupt:
+        stats = watcher.stats
+    logger.info("%(processed)d processed, %(unchanged)d unchanged, %(removed)d removed, %(errors)d errors", stats)
+    return 1 if stats['errors'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())